@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from app.schemas.user import UserCreate, UserRead, UserLogin, UserBase
 from app.core.database import db  # Correct import for Motor client
-from app.core.security import hash_password, verify_password, create_access_token
-from app.core.auth import get_current_user
+from app.core.security import hash_password_async, verify_and_update_password, create_access_token
+from app.core.auth import get_current_user, invalidate_user
 from app.models.users import UserInDB  # Pydantic user model
 from bson.objectid import ObjectId
 from datetime import datetime
@@ -20,7 +20,7 @@ async def register(user: UserCreate):
             detail="Email already registered"
         )
 
-    hashed_pw = hash_password(user.password)
+    hashed_pw = await hash_password_async(user.password)
     user_dict = user.dict()
     user_dict["hashed_password"] = hashed_pw
     user_dict["created_at"] = datetime.utcnow()
@@ -35,11 +35,21 @@ async def register(user: UserCreate):
 @router.post("/login")
 async def login(user: UserLogin):
     db_user = await db.users.find_one({"email": user.email})
-    if not db_user or not verify_password(user.password, db_user.get("hashed_password", "")):
+    if not db_user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials"
         )
+    valid, new_hash = await verify_and_update_password(user.password, db_user.get("hashed_password", ""))
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials"
+        )
+    # pwd_context cost settings changed since this hash was made; upgrade it now
+    if new_hash:
+        await db.users.update_one({"_id": db_user["_id"]}, {"$set": {"hashed_password": new_hash}})
+        invalidate_user(db_user["email"])
     access_token = create_access_token({"sub": db_user["email"]})
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -60,6 +70,9 @@ async def update_profile(
     update_data = {k: v for k, v in update_data.items() if k not in protected_fields}
 
     await db.users.update_one({"_id": obj_id}, {"$set": update_data})
+    invalidate_user(current_user.email)
     updated_user = await db.users.find_one({"_id": obj_id})
+    if updated_user["email"] != current_user.email:
+        invalidate_user(updated_user["email"])
     updated_user["_id"] = str(updated_user["_id"])
     return UserRead(**updated_user)
\ No newline at end of file
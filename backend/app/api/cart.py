@@ -1,66 +1,142 @@
 # File: backend/app/api/cart.py
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException
+from typing import Optional
 from datetime import datetime
-from app.schemas.cart import CartItemCreate, CartItemRead
-from app.models.cart import Cart
-from app.models.purchase import Purchase
-from app.core.database import get_db
+from app.schemas.cart import CartBatch, CartItemCreate, CartItemRead, CartRead
+from app.core import idempotency
+from app.core.database import client, db, supports_transactions
 from app.core.auth import get_current_user
-from app.models.users import User
+from app.core.serialization import FastJSONResponse
+from app.models.users import UserInDB
+from app.services import carts, seller_stats
+from bson.objectid import ObjectId
 
 
 router = APIRouter(prefix="/cart", tags=["cart"])
 
+MAX_BATCH_ITEMS = 100
+
 
 @router.post("/", response_model=CartItemRead)
-def add_to_cart(
+async def add_to_cart(
     item: CartItemCreate,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+    current_user: UserInDB = Depends(get_current_user),
 ):
-    cart_item = Cart(**item.dict(), user_id=current_user.id)
-    db.add(cart_item)
-    db.commit()
-    db.refresh(cart_item)
-    return cart_item
+    """Add a product; if it is already in the cart its quantity is increased."""
+    if await carts.missing_products([item.product_id]):
+        raise HTTPException(404, "Product not found")
+
+    cart = await carts.apply(current_user.id, carts.build_update(add=[(item.product_id, item.quantity)]))
+    line = cart["items"][item.product_id]
+    return CartItemRead(product_id=item.product_id, quantity=line["quantity"], added_at=line["added_at"])
 
 
-@router.get("/", response_model=List[CartItemRead])
-def get_cart(
-    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+@router.post("/items", response_model=CartRead)
+async def update_cart_items(
+    batch: CartBatch,
+    current_user: UserInDB = Depends(get_current_user),
 ):
-    return db.query(Cart).filter(Cart.user_id == current_user.id).all()
+    """Add, update and remove many items in one atomic write; returns the resulting cart."""
+    if len(batch.add) + len(batch.update) + len(batch.remove) > MAX_BATCH_ITEMS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_ITEMS} items per request")
+    invalid = carts.invalid_product_ids(batch.remove)
+    if invalid:
+        raise HTTPException(status_code=422, detail=f"Not product ids: {', '.join(invalid)}")
+    missing = await carts.missing_products(item.product_id for item in batch.add + batch.update)
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Products not found: {', '.join(missing)}")
+    try:
+        update = carts.build_update(
+            add=[(item.product_id, item.quantity) for item in batch.add],
+            update=[(item.product_id, item.quantity) for item in batch.update],
+            remove=batch.remove,
+        )
+    except carts.CartConflict as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    await carts.apply(current_user.id, update)
+    return FastJSONResponse(await carts.read_cart(current_user.id))
+
 
+@router.get("/", response_model=CartRead)
+async def get_cart(current_user: UserInDB = Depends(get_current_user)):
+    # Already shaped like CartRead; skips a second validation pass
+    return FastJSONResponse(await carts.read_cart(current_user.id))
 
-@router.delete("/{item_id}")
-def delete_cart_item(
-    item_id: int, db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+
+@router.delete("/{product_id}")
+async def delete_cart_item(
+    product_id: str, current_user: UserInDB = Depends(get_current_user)
 ):
-    item = db.query(Cart).filter(Cart.id == item_id, Cart.user_id == current_user.id).first()
-    if not item:
+    if not await carts.remove_item(current_user.id, product_id):
         raise HTTPException(404, "Cart item not found")
-    db.delete(item)
-    db.commit()
     return {"detail": "Item removed from cart"}
 
 
 @router.post("/checkout")
-def checkout(
-    db: Session = Depends(get_db), current_user: User = Depends(get_current_user)
+async def checkout(
+    current_user: UserInDB = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
-    cart_items = db.query(Cart).filter(Cart.user_id == current_user.id).all()
+    if idempotency_key:
+        previous = await idempotency.claim(current_user.id, "checkout", idempotency_key)
+        if previous is not None:
+            return previous
+
+    try:
+        return await _checkout(current_user, idempotency_key)
+    except BaseException:
+        if idempotency_key:
+            await idempotency.release(current_user.id, "checkout", idempotency_key)
+        raise
+
+
+async def _checkout(current_user: UserInDB, idempotency_key: Optional[str]) -> dict:
+    cart = await db.carts.find_one({"_id": current_user.id}, {"items": 1, "version": 1})
+    cart_items = [
+        {"product_id": product_id, "quantity": line.get("quantity", 1)}
+        for product_id, line in ((cart or {}).get("items") or {}).items()
+    ]
     if not cart_items:
         raise HTTPException(status_code=400, detail="Cart is empty")
-    for item in cart_items:
-        purchase = Purchase(
-            user_id=current_user.id,
-            product_id=item.product_id,
-            purchased_at=datetime.utcnow(),
-        )
-        db.add(purchase)
-        db.delete(item)
-    db.commit()
-    return {"detail": f"{len(cart_items)} purchases created and cart cleared"}
+
+    product_ids = {ObjectId(item["product_id"]) for item in cart_items if ObjectId.is_valid(item["product_id"])}
+    products = {
+        str(doc["_id"]): doc
+        async for doc in db.products.find({"_id": {"$in": list(product_ids)}}, {"price": 1, "owner_id": 1})
+    }
+    prices = {product_id: doc.get("price") for product_id, doc in products.items()}
+    owners = {product_id: doc.get("owner_id") for product_id, doc in products.items()}
+    missing = [item["product_id"] for item in cart_items if item["product_id"] not in prices]
+    if missing:
+        raise HTTPException(status_code=409, detail=f"Products no longer available: {', '.join(missing)}")
+
+    now = datetime.utcnow()
+    purchases = [
+        {
+            "user_id": current_user.id,
+            "product_id": item["product_id"],
+            "quantity": item["quantity"],
+            "price": prices[item["product_id"]],
+            "purchased_at": now,
+        }
+        for item in cart_items
+    ]
+    response = {"detail": f"{len(purchases)} purchases created and cart cleared"}
+
+    async def write(session=None):
+        # Claim the cart first: a concurrent checkout or cart edit bumps the
+        # version, and then nothing below may be written
+        if not await carts.clear_for_checkout(current_user.id, cart.get("version"), now, session=session):
+            raise HTTPException(status_code=409, detail="Cart changed during checkout; please try again")
+        await db.purchases.insert_many(purchases, ordered=False, session=session)
+        await seller_stats.record_purchases(purchases, owners, session=session)
+        if idempotency_key:
+            await idempotency.complete(current_user.id, "checkout", idempotency_key, response, session=session)
+
+    if await supports_transactions():
+        async with await client.start_session() as session:
+            await session.with_transaction(write)
+    else:
+        await write()
+    return response
@@ -1,17 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, File
-from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import List, Literal, Optional
 from app.schemas.product import ProductCreate, ProductRead
 from app.core.auth import get_current_user
 from app.models.users import UserInDB
 from app.core.database import db  # Use your mongodb.py file here (correct import)
+from app.core.response_cache import cached_response
+from app.core.serialization import FastJSONResponse
+from app.crud import product as crud_product
+from app.services import bulk, facets, images, popularity, similar
+from app.services.product_cache import CACHE_CONTROL, listing_tag, product_responses, product_tag
+from app.services import search as product_search
 from bson.objectid import ObjectId
-import shutil
-import os
-import datetime
 
 router = APIRouter(prefix="/products", tags=["products"])
 
-UPLOAD_DIRECTORY = "backend/uploads"
+MAX_IDS_PER_REQUEST = 100
 
 
 @router.post("/", response_model=ProductRead)
@@ -19,15 +23,54 @@ async def create_product(
     product: ProductCreate,
     current_user: UserInDB = Depends(get_current_user),
 ):
-    product_dict = product.dict()
-    product_dict.update({
-        "owner_id": current_user.id,
-        "created_at": datetime.datetime.utcnow()
-    })
+    return await crud_product.create_product(product, current_user.id)
 
-    result = await db.products.insert_one(product_dict)
-    product_dict["_id"] = str(result.inserted_id)
-    return ProductRead(**product_dict)
+
+@router.post("/bulk")
+async def bulk_create_products(
+    request: Request,
+    current_user: UserInDB = Depends(get_current_user),
+):
+    """Import products from an NDJSON body, or CSV with a header row when sent as text/csv."""
+    records = bulk.iter_records(request.stream(), request.headers.get("content-type", ""))
+    return await bulk.import_products(records, current_user.id)
+
+
+@router.get("/export")
+async def export_products(
+    mine: bool = Query(True, description="Only export the caller's own listings"),
+    current_user: UserInDB = Depends(get_current_user),
+):
+    query = {"owner_id": current_user.id} if mine else {}
+    return StreamingResponse(bulk.export_products(query), media_type="application/x-ndjson")
+
+
+@router.get("/facets")
+async def product_facets(
+    category: Optional[str] = Query(None),
+    search: Optional[str] = Query(None),
+):
+    """Counts per category and price band; served from counters unless filtered."""
+    if not category and not search:
+        return await facets.get_facets()
+    match = {}
+    if category:
+        match["category"] = category
+    if search:
+        terms = product_search.query_terms(search)
+        if not terms:
+            return await facets.compute_facets({"_id": None})
+        match.update(product_search.match_filter(terms))
+    return await facets.compute_facets(match)
+
+
+async def _owned_product(product_id: str, current_user: UserInDB, action: str) -> ProductRead:
+    product = await crud_product.get_product(product_id)
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+    if product.owner_id != current_user.id:
+        raise HTTPException(status_code=403, detail=f"Not authorized to {action} this product")
+    return product
 
 
 @router.put("/{product_id}", response_model=ProductRead)
@@ -36,18 +79,11 @@ async def update_product(
     product_data: ProductCreate,
     current_user: UserInDB = Depends(get_current_user),
 ):
-    obj_id = ObjectId(product_id)
-    product = await db.products.find_one({"_id": obj_id})
-    if not product:
+    await _owned_product(product_id, current_user, "update")
+    updated_product = await crud_product.update_product(product_id, product_data)
+    if not updated_product:
         raise HTTPException(status_code=404, detail="Product not found")
-    if product.get("owner_id") != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to update this product")
-
-    update_data = product_data.dict(exclude_unset=True)
-    await db.products.update_one({"_id": obj_id}, {"$set": update_data})
-    updated_product = await db.products.find_one({"_id": obj_id})
-    updated_product["_id"] = str(updated_product["_id"])
-    return ProductRead(**updated_product)
+    return updated_product
 
 
 @router.delete("/{product_id}")
@@ -55,53 +91,116 @@ async def delete_product(
     product_id: str,
     current_user: UserInDB = Depends(get_current_user),
 ):
-    obj_id = ObjectId(product_id)
-    product = await db.products.find_one({"_id": obj_id})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    if product.get("owner_id") != current_user.id:
-        raise HTTPException(status_code=403, detail="Not authorized to delete this product")
-
-    await db.products.delete_one({"_id": obj_id})
+    await _owned_product(product_id, current_user, "delete")
+    await crud_product.delete_product(product_id)
     return {"detail": "Product deleted successfully"}
 
 
 @router.get("/", response_model=List[ProductRead])
 async def list_products(
+    request: Request,
     category: Optional[str] = Query(None),
     search: Optional[str] = Query(None),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    sort: Optional[Literal["newest", "price_asc", "price_desc", "title"]] = Query(
+        None, description="Defaults to newest, or relevance when searching"
+    ),
     limit: int = Query(10, ge=1),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    ids: Optional[str] = Query(None, description="Comma-separated product ids to fetch in one request"),
 ):
-    query = {}
-    if category:
-        query["category"] = category
-    if search:
-        query["title"] = {"$regex": search, "$options": "i"}
-
-    cursor = db.products.find(query).skip(offset).limit(limit)
-    products = []
-    async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
-        products.append(ProductRead(**doc))
-    return products
+    if ids:
+        return await _products_by_ids(request, ids)
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=400, detail="min_price cannot exceed max_price")
+
+    async def load():
+        products, next_cursor = await crud_product.get_product_docs_page(
+            limit=limit,
+            offset=offset,
+            category=category,
+            search=search,
+            cursor=cursor,
+            min_price=min_price,
+            max_price=max_price,
+            sort=sort,
+        )
+        # The body stays a plain list for existing clients; the next page key
+        # travels in a header.
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+        return products, headers
+
+    key = ("list", category, search, min_price, max_price, sort, limit, offset, cursor)
+    entry = await product_responses.get_or_load(key, [listing_tag(category)], load)
+    return cached_response(request, entry, CACHE_CONTROL)
+
+
+async def _products_by_ids(request: Request, ids: str):
+    product_ids = list(dict.fromkeys(pid.strip() for pid in ids.split(",") if pid.strip()))
+    if len(product_ids) > MAX_IDS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_IDS_PER_REQUEST} ids per request")
+
+    async def load():
+        return await crud_product.get_product_docs_by_ids(product_ids), {}
+
+    key = ("ids", tuple(product_ids))
+    entry = await product_responses.get_or_load(key, [product_tag(pid) for pid in product_ids], load)
+    return cached_response(request, entry, CACHE_CONTROL)
+
+
+@router.get("/trending")
+async def trending_products(limit: int = Query(20, ge=1, le=MAX_IDS_PER_REQUEST)):
+    """Most viewed products lately, each with `views` (all time) and `trending_score` (decayed views)."""
+    # Stats of a product deleted mid-flush can outlive it briefly; keep reading
+    # down the ranking until the page is full rather than return it short
+    rows = []
+    skip = 0
+    while len(rows) < limit:
+        ranked = await popularity.trending(limit, skip)
+        products = {p["_id"]: p for p in await crud_product.get_product_docs_by_ids([r["product_id"] for r in ranked])}
+        rows.extend(
+            {**products[r["product_id"]], "views": r["views"], "trending_score": r["score"]}
+            for r in ranked
+            if r["product_id"] in products
+        )
+        if len(ranked) < limit:
+            break
+        skip += limit
+    return FastJSONResponse(rows[:limit])
 
 
 @router.get("/{product_id}", response_model=ProductRead)
-async def get_product(product_id: str):
-    obj_id = ObjectId(product_id)
-    product = await db.products.find_one({"_id": obj_id})
-    if not product:
-        raise HTTPException(status_code=404, detail="Product not found")
-    product["_id"] = str(product["_id"])
-    return ProductRead(**product)
-
-
-@router.post("/upload-image/")
-async def upload_image(file: UploadFile = File(...)):
-    if not os.path.exists(UPLOAD_DIRECTORY):
-        os.makedirs(UPLOAD_DIRECTORY)
-    file_location = os.path.join(UPLOAD_DIRECTORY, file.filename)
-    with open(file_location, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
-    return {"image_url": f"/uploads/{file.filename}"}
+async def get_product(product_id: str, request: Request):
+    async def load():
+        obj_id = ObjectId(product_id)
+        product = await db.products.find_one({"_id": obj_id}, crud_product.READ_PROJECTION)
+        if not product:
+            raise HTTPException(status_code=404, detail="Product not found")
+        return crud_product.product_json(product), {}
+
+    entry = await product_responses.get_or_load(("detail", product_id), [product_tag(product_id)], load)
+    # Counted in memory, cache hits and 304s included; see app.services.popularity
+    popularity.views.record(product_id)
+    return cached_response(request, entry, CACHE_CONTROL)
+
+
+@router.get("/{product_id}/similar")
+async def similar_products(product_id: str, limit: int = Query(similar.TOP_K, ge=1, le=similar.TOP_K)):
+    """Precomputed neighbours as [{product_id, score}]; fetch details with ?ids=."""
+    return FastJSONResponse(await similar.get_similar(product_id, limit))
+
+
+# The body is parsed by images.store_image as it streams in rather than by
+# FastAPI, which would spool all of it first; the schema documents the form
+@router.post("/upload-image/", openapi_extra={"requestBody": {
+    "required": True,
+    "content": {"multipart/form-data": {"schema": {
+        "type": "object",
+        "properties": {images.UPLOAD_FIELD: {"type": "string", "format": "binary"}},
+        "required": [images.UPLOAD_FIELD],
+    }}},
+}})
+async def upload_image(request: Request):
+    return await images.store_image(request)
@@ -1,19 +1,39 @@
-from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from fastapi import APIRouter, Depends, Query
+from typing import List, Optional
 from app.schemas.purchase import PurchaseRead
 from app.core.auth import get_current_user
-from app.models.users import User
-from app.core.database import db
-from bson.objectid import ObjectId
+from app.models.users import UserInDB
+from app.crud import purchase as crud_purchase
+from app.core.serialization import FastJSONResponse
 
 router = APIRouter(prefix="/purchases", tags=["purchases"])
 
-
 @router.get("/", response_model=List[PurchaseRead])
-async def get_purchases(current_user: User = Depends(get_current_user)):
-    cursor = db.purchases.find({"user_id": current_user.id})
-    purchases = []
-    async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
-        purchases.append(PurchaseRead(**doc))
-    return purchases
+async def get_purchases(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from X-Next-Cursor"),
+    current_user: UserInDB = Depends(get_current_user),
+):
+    docs, next_cursor = await crud_purchase.purchase_history(current_user.id, limit, cursor)
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else {}
+    # Built to PurchaseRead's shape directly; skips a second validation pass
+    return FastJSONResponse([_purchase_json(doc) for doc in docs], headers=headers)
+
+
+def _purchase_json(doc: dict) -> dict:
+    product = doc.get("product")
+    return {
+        "product_id": doc["product_id"],
+        "quantity": doc.get("quantity", 1),
+        "price": doc.get("price"),
+        "_id": str(doc["_id"]),
+        "user_id": doc["user_id"],
+        "purchased_at": doc["purchased_at"],
+        "product": {
+            "_id": str(product["_id"]),
+            "title": product.get("title"),
+            "price": product.get("price"),
+            "image_url": product.get("image_url"),
+            "thumbnail_url": product.get("thumbnail_url"),
+        } if product else None,
+    }
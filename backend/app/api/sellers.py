@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Literal
+from app.core.auth import get_current_user
+from app.models.users import UserInDB
+from app.core.serialization import FastJSONResponse
+from app.services import seller_stats
+
+router = APIRouter(prefix="/sellers", tags=["sellers"])
+
+
+@router.get("/me/stats")
+async def get_my_stats(
+    window: Literal["day", "week", "month"] = Query("week", description="Today, or the last 7 or 30 days"),
+    current_user: UserInDB = Depends(get_current_user),
+):
+    # Reads at most 30 daily rollups that checkout keeps current
+    return FastJSONResponse(await seller_stats.get_stats(current_user.id, window))
@@ -1,12 +1,43 @@
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from app.core import change_feed
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.metrics import register_stats
 from app.core.security import decode_access_token
 from app.core.database import db
 from app.models.users import UserInDB  # your pydantic user model
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
+# Verified principals keyed by token subject (the user's email). The JWT is
+# still decoded on every request, so expiry and signature checks stay exact;
+# only the Mongo lookup is skipped on a hit.
+user_cache = TTLCache(
+    maxsize=settings.USER_CACHE_MAX_ENTRIES,
+    ttl=settings.USER_CACHE_TTL_SECONDS,
+)
+register_stats("user_cache", "Authenticated user cache", user_cache.stats)
+
+
+def invalidate_user(email: str) -> None:
+    """Drop a cached user; call after any write to the users collection."""
+    user_cache.invalidate(email)
+    change_feed.touch("users")
+
+
+def _on_user_change(event: change_feed.ChangeEvent) -> None:
+    # Writes from other workers; the event has the id, but the cache is keyed by email
+    if event.operation == "reset":
+        user_cache.clear()
+        return
+    user_id = str(event.document_id)
+    user_cache.invalidate_where(lambda user: user.id == user_id)
+
+
+change_feed.subscribe("users", _on_user_change)
+
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
     payload = decode_access_token(token)
@@ -17,6 +48,10 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
         )
 
     user_email = payload.get("sub")
+    cached = user_cache.get(user_email)
+    if cached is not None:
+        return cached.copy()
+
     user_doc = await db.users.find_one({"email": user_email})
     if user_doc is None:
         raise HTTPException(
@@ -25,4 +60,6 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
         )
 
     user_doc["_id"] = str(user_doc["_id"])
-    return UserInDB(**user_doc)
\ No newline at end of file
+    user = UserInDB(**user_doc)
+    user_cache.set(user_email, user)
+    return user.copy()
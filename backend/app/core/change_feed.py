@@ -0,0 +1,180 @@
+# File: backend/app/core/change_feed.py
+#
+# Keeps in-process caches coherent across worker processes. Modules holding
+# cached copies of Mongo data subscribe() to a collection and are called with
+# a ChangeEvent for every write to it, whichever process made the write.
+#
+# On a replica set or sharded cluster (a single-node replica set is enough)
+# events come from one change stream on the database, resumed from the last
+# token after a dropped connection; documents in events carry only the fields
+# subscribers asked for. Without change streams, every process polls a
+# per-collection counter in `cache_versions`; a changed counter can't say
+# which documents changed, so subscribers get a "reset" event and drop
+# everything they hold for that collection.
+#
+# Writers bump those counters through touch() whichever mode they run in
+# themselves: the mode is decided per process, and a process that fell back
+# to polling still has to hear about writes from processes on the stream.
+
+import asyncio
+import logging
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Set
+from pymongo.errors import OperationFailure, PyMongoError
+from app.core.config import settings
+from app.core.database import db, supports_transactions
+from app.core.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# Server error for a resume token that has fallen off the oplog
+CHANGE_STREAM_HISTORY_LOST = 286
+RETRY_SECONDS = 1.0
+
+change_events = Counter("change_feed_events_total", "Cache invalidation events received", ("collection", "operation"))
+
+
+class ChangeEvent(NamedTuple):
+    collection: str
+    operation: str  # insert, update, replace, delete, or reset (forget everything)
+    document_id: Any = None
+    document: Optional[dict] = None  # Subscribed fields of the current version; None after a delete
+    updated_fields: Optional[Set[str]] = None  # Top-level fields an update changed
+
+
+_subscribers: Dict[str, List[Callable[[ChangeEvent], None]]] = {}
+_document_fields: Set[str] = set()  # Fields of the changed document any subscriber reads
+_mode: Optional[str] = None  # "stream" or "poll" once run() has started
+_pending_touches: Set[asyncio.Task] = set()
+
+
+def subscribe(collection: str, callback: Callable[[ChangeEvent], None], fields: Iterable[str] = ()) -> None:
+    """Call `callback` for writes to `collection`; event documents include `fields`."""
+    _subscribers.setdefault(collection, []).append(callback)
+    _document_fields.update(fields)
+
+
+def publish(event: ChangeEvent) -> None:
+    change_events.inc((event.collection, event.operation))
+    for callback in _subscribers.get(event.collection, ()):
+        try:
+            callback(event)
+        except Exception:
+            logger.exception("Change subscriber failed for %s", event.collection)
+
+
+def _reset_all() -> None:
+    for collection in list(_subscribers):
+        publish(ChangeEvent(collection, "reset"))
+
+
+def touch(collection: str) -> None:
+    """Record a write for processes that poll. A no-op until run() has started."""
+    if _mode is None or collection not in _subscribers:
+        return
+    task = asyncio.get_running_loop().create_task(
+        db.cache_versions.update_one({"_id": collection}, {"$inc": {"version": 1}}, upsert=True)
+    )
+    _pending_touches.add(task)
+    task.add_done_callback(_pending_touches.discard)
+
+
+def _event_from_change(change: dict) -> ChangeEvent:
+    operation = change["operationType"]
+    collection = change.get("ns", {}).get("coll")
+    if operation not in ("insert", "update", "replace", "delete"):
+        # drop, rename, invalidate, ...: the collection as a whole changed
+        return ChangeEvent(collection, "reset")
+    updated = None
+    if operation == "update":
+        removed = change.get("updateDescription", {}).get("removedFields", [])
+        changed = list(change.get("updatedPaths") or []) + list(removed)
+        updated = {field.split(".", 1)[0] for field in changed}
+    return ChangeEvent(
+        collection,
+        operation,
+        change.get("documentKey", {}).get("_id"),
+        change.get("fullDocument"),
+        updated,
+    )
+
+
+def _stream_pipeline(collections: List[str]) -> list:
+    # Updated values (a product's search_terms, say) and unread fields of the
+    # looked-up document never leave the server; updates keep their paths
+    projection = {
+        "operationType": 1,
+        "ns": 1,
+        "documentKey": 1,
+        "updateDescription.removedFields": 1,
+        "updatedPaths": {"$map": {
+            "input": {"$objectToArray": "$updateDescription.updatedFields"},
+            "in": "$$this.k",
+        }},
+    }
+    projection.update({f"fullDocument.{field}": 1 for field in sorted(_document_fields)})
+    return [{"$match": {"ns.coll": {"$in": collections}}}, {"$project": projection}]
+
+
+async def _watch(collections: List[str]) -> None:
+    pipeline = _stream_pipeline(collections)
+    resume_token = None
+    while True:
+        try:
+            async with db.watch(pipeline, full_document="updateLookup", resume_after=resume_token) as stream:
+                async for change in stream:
+                    resume_token = stream.resume_token
+                    publish(_event_from_change(change))
+        except OperationFailure as exc:
+            if exc.code != CHANGE_STREAM_HISTORY_LOST:
+                raise
+            # Events were missed and can't be replayed
+            logger.warning("Change stream history lost; resetting caches")
+            resume_token = None
+            _reset_all()
+        except PyMongoError:
+            logger.exception("Change stream interrupted; resuming")
+            await asyncio.sleep(RETRY_SECONDS)
+
+
+async def _poll(collections: List[str], interval: float) -> None:
+    seen: Optional[Dict[str, int]] = None
+    while True:
+        try:
+            current = {c: 0 for c in collections}
+            async for doc in db.cache_versions.find({"_id": {"$in": collections}}):
+                current[doc["_id"]] = doc.get("version", 0)
+            if seen is not None:
+                for collection, version in current.items():
+                    if version != seen[collection]:
+                        publish(ChangeEvent(collection, "reset"))
+            seen = current
+        except PyMongoError:
+            logger.exception("Polling cache versions failed")
+        await asyncio.sleep(interval)
+
+
+async def run() -> None:
+    """Deliver change events until cancelled; started from the app lifespan."""
+    global _mode
+    collections = sorted(_subscribers)
+    if not collections or settings.CHANGE_FEED_MODE == "off":
+        return
+    mode = settings.CHANGE_FEED_MODE
+    if mode == "auto":
+        try:
+            # Change streams need the same deployments transactions do
+            mode = "stream" if await supports_transactions() else "poll"
+        except PyMongoError:
+            mode = "poll"
+    _mode = mode
+    logger.info("Cache invalidation via %s for %s", mode, ", ".join(collections))
+    try:
+        if mode == "stream":
+            try:
+                await _watch(collections)
+            except OperationFailure:
+                logger.exception("Change streams unavailable; polling cache versions instead")
+                _mode = "poll"
+        await _poll(collections, settings.CHANGE_FEED_POLL_SECONDS)
+    finally:
+        _mode = None
@@ -3,9 +3,44 @@
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
-    DATABASE_URL: str = "sqlite:///./ecofinds.db"  # Change to your Postgres URL if needed
+    ENV: str = "development"  # development, test or production
+    DATABASE_URL: str = "mongodb://localhost:27017/"
+    DATABASE_NAME: str = "ecofinds_db"
+    MONGO_MAX_POOL_SIZE: int = 100  # Connections per server, per worker process
+    MONGO_MIN_POOL_SIZE: int = 10  # Kept open and warmed at startup
+    MONGO_MAX_IDLE_TIME_MS: int | None = None
+    MONGO_WAIT_QUEUE_TIMEOUT_MS: int | None = None  # Max wait for a free pooled connection
+    MONGO_CONNECT_TIMEOUT_MS: int = 10_000
+    MONGO_SERVER_SELECTION_TIMEOUT_MS: int = 5_000
+    MONGO_SOCKET_TIMEOUT_MS: int | None = None
+    MONGO_READ_PREFERENCE: str = "primary"  # e.g. primaryPreferred, secondaryPreferred, nearest
+    MONGO_COMPRESSORS: str = ""  # Comma-separated: zstd, snappy, zlib
     SECRET_KEY: str = "your_secret_key_here_please_change"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 1 day
+    USER_CACHE_TTL_SECONDS: float = 60  # How long a verified user stays cached
+    USER_CACHE_MAX_ENTRIES: int = 10_000
+    PASSWORD_HASH_WORKERS: int = 4  # Threads dedicated to bcrypt
+    PASSWORD_HASH_MAX_PENDING: int = 64  # Queued + running hashes before answering 503
+    PRODUCT_CACHE_TTL_SECONDS: float = 300
+    PRODUCT_CACHE_MAX_ENTRIES: int = 1000
+    PRODUCT_CACHE_MAX_AGE: int = 0  # Browsers revalidate with If-None-Match every time
+    FACET_RECONCILE_SECONDS: float = 600  # How often facet counters are recomputed from products
+    VIEW_FLUSH_SECONDS: float = 10  # How often buffered product views are written
+    TRENDING_HALF_LIFE_HOURS: float = 24  # A view counts half as much toward trending after this long
+    JOB_QUEUES: dict[str, int] = {"default": 4}  # Queue name -> concurrent workers
+    JOB_PERSIST: bool = True  # Keep pending jobs of persist=True handlers in Mongo so they survive restarts
+    JOB_RETRY_BASE_SECONDS: float = 1  # Backoff doubles from here per failed attempt
+    JOB_RETRY_MAX_SECONDS: float = 300
+    JOB_LEASE_SECONDS: float = 300  # A persisted job whose lease isn't renewed this long is taken over
+    JOB_DRAIN_SECONDS: float = 10  # Grace period for running jobs at shutdown
+    CHANGE_FEED_MODE: str = "auto"  # auto, stream (change streams), poll (cache_versions counters) or off
+    CHANGE_FEED_POLL_SECONDS: float = 1  # How stale other workers' caches can get when polling
+    SLOW_REQUEST_MS: float = 0  # Log requests slower than this with their Mongo commands; 0 disables
+    UPLOAD_DIR: str = "backend/uploads"
+    MAX_UPLOAD_BYTES: int = 10 * 1024 * 1024  # 10 MB
+    THUMBNAIL_SIZES: list[int] = [200, 600]  # Longest edge, in pixels
+    IMAGE_WORKERS: int = 2  # Processes used for resizing
+    SIMILAR_MODEL_PATH: str = "backend/similar_products.npz"  # Written by python -m app.services.similar
 
     class Config:
         env_file = ".env"
@@ -1,6 +1,53 @@
+import asyncio
 from motor.motor_asyncio import AsyncIOMotorClient
+from app.core.config import settings
+from app.core.metrics import MongoCommandListener, MongoPoolListener
 
-MONGO_URL = "mongodb://localhost:27017/"
 
-client = AsyncIOMotorClient(MONGO_URL)
-db = client.ecofinds_db  # Your MongoDB database name
+def _client_options() -> dict:
+    options = {
+        "maxPoolSize": settings.MONGO_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGO_MIN_POOL_SIZE,
+        "connectTimeoutMS": settings.MONGO_CONNECT_TIMEOUT_MS,
+        "serverSelectionTimeoutMS": settings.MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "readPreference": settings.MONGO_READ_PREFERENCE,
+        "event_listeners": [MongoCommandListener(), MongoPoolListener()],
+    }
+    optional = {
+        "maxIdleTimeMS": settings.MONGO_MAX_IDLE_TIME_MS,
+        "waitQueueTimeoutMS": settings.MONGO_WAIT_QUEUE_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGO_SOCKET_TIMEOUT_MS,
+        "compressors": settings.MONGO_COMPRESSORS or None,
+    }
+    options.update({key: value for key, value in optional.items() if value is not None})
+    return options
+
+
+# Creating the client does no I/O; connections are opened by open_database()
+# from the app lifespan and on demand after that. Modules import `db` directly.
+client = AsyncIOMotorClient(settings.DATABASE_URL, **_client_options())
+db = client[settings.DATABASE_NAME]
+
+_transactions_supported: bool | None = None
+
+
+async def open_database():
+    # Fail fast if Mongo is unreachable, then open the minimum pool up front
+    # so the first requests don't pay for TCP/TLS handshakes.
+    await client.admin.command("ping")
+    warm = max(settings.MONGO_MIN_POOL_SIZE, 1)
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(warm)))
+    await supports_transactions()
+
+
+def close_database():
+    client.close()
+
+
+async def supports_transactions() -> bool:
+    # Multi-document transactions need a replica set or a sharded cluster
+    global _transactions_supported
+    if _transactions_supported is None:
+        hello = await client.admin.command("hello")
+        _transactions_supported = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return _transactions_supported
@@ -0,0 +1,69 @@
+# File: backend/app/core/idempotency.py
+#
+# Stores the outcome of requests sent with an Idempotency-Key header so a
+# retried request replays the first response instead of repeating the write.
+# A key being worked on is leased for PENDING_LEASE_SECONDS, so a retry can
+# take over the key of a request whose process died before finishing.
+
+from datetime import datetime, timedelta
+from fastapi import HTTPException, status
+from pymongo import IndexModel, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from app.core.database import db
+
+KEY_TTL_SECONDS = 24 * 60 * 60
+PENDING_LEASE_SECONDS = 30  # Well above a checkout's worst case
+
+
+# Registered in app.core.indexes; Mongo drops records once they expire
+TTL_INDEX = IndexModel([("created_at", 1)], expireAfterSeconds=KEY_TTL_SECONDS, name="idempotency_ttl")
+
+
+def _record_id(user_id: str, scope: str, key: str) -> str:
+    return f"{user_id}:{scope}:{key}"
+
+
+async def claim(user_id: str, scope: str, key: str) -> dict | None:
+    """Reserve a key. Returns the stored response if the request already completed."""
+    record_id = _record_id(user_id, scope, key)
+    now = datetime.utcnow()
+    locked_until = now + timedelta(seconds=PENDING_LEASE_SECONDS)
+    try:
+        await db.idempotency_keys.insert_one({
+            "_id": record_id,
+            "status": "pending",
+            "created_at": now,
+            "locked_until": locked_until,
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+    # A pending record whose lease ran out was left by a request that never
+    # finished; take it over
+    record = await db.idempotency_keys.find_one_and_update(
+        {"_id": record_id, "status": "pending", "locked_until": {"$lt": now}},
+        {"$set": {"created_at": now, "locked_until": locked_until}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if record is not None:
+        return None
+    record = await db.idempotency_keys.find_one({"_id": record_id})
+    if record and record.get("status") == "completed":
+        return record["response"]
+    raise HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="A request with this Idempotency-Key is already in progress"
+    )
+
+
+async def complete(user_id: str, scope: str, key: str, response: dict, session=None):
+    await db.idempotency_keys.update_one(
+        {"_id": _record_id(user_id, scope, key)},
+        {"$set": {"status": "completed", "response": response}},
+        session=session,
+    )
+
+
+async def release(user_id: str, scope: str, key: str):
+    # Called when the request failed, so a retry is allowed to run again
+    await db.idempotency_keys.delete_one({"_id": _record_id(user_id, scope, key), "status": "pending"})
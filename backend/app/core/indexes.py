@@ -0,0 +1,146 @@
+# File: backend/app/core/indexes.py
+#
+# Every index the app relies on is declared here and created at startup.
+# create_indexes is idempotent, so restarting against an existing database is
+# cheap. QUERY_SHAPES lists the queries the API issues; in development and
+# test, check_query_plans() explains each one and refuses to start if any of
+# them would scan a whole collection or sort in memory.
+
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from app.core.database import db
+from app.core.pagination import apply_cursor, encode_cursor
+from app.core.idempotency import TTL_INDEX as IDEMPOTENCY_TTL_INDEX
+from app.core.jobs import RECOVERY_INDEX as JOBS_RECOVERY_INDEX
+from app.crud.product import LISTING_SORTS, listing_filter, listing_index
+from app.crud.purchase import HISTORY_SORT
+from app.services.popularity import SCORE_FIELD as TRENDING_SCORE_FIELD, TRENDING_INDEX
+from app.services.search import SEARCH_INDEX
+
+def _listing_indexes() -> List[IndexModel]:
+    # One per LISTING_INDEX_KEYS entry, plain and category-prefixed,
+    # e.g. products_price and products_category_price
+    indexes = {}
+    for sort in LISTING_SORTS:
+        for by_category in (False, True):
+            keys = listing_index(sort, by_category)
+            name = "products_" + "_".join(field for field, _ in keys if field != "_id")
+            indexes[name] = IndexModel(keys, name=name)
+    return list(indexes.values())
+
+
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True, name="users_email_unique"),
+    ],
+    "products": [
+        *_listing_indexes(),
+        IndexModel([("owner_id", ASCENDING)], name="products_owner_id"),
+        SEARCH_INDEX,
+    ],
+    "purchases": [
+        IndexModel([("user_id", ASCENDING)] + HISTORY_SORT, name="purchases_user_purchased_at_id"),
+    ],
+    "seller_rollups": [
+        IndexModel([("seller_id", ASCENDING), ("day", DESCENDING)], unique=True, name="seller_rollups_seller_day"),
+    ],
+    "product_stats": [
+        TRENDING_INDEX,
+    ],
+    "idempotency_keys": [
+        IDEMPOTENCY_TTL_INDEX,
+    ],
+    "jobs": [
+        JOBS_RECOVERY_INDEX,
+    ],
+}
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    filter: dict
+    sort: Optional[list] = None
+    hint: Optional[list] = None
+
+
+def _listing_shapes() -> List[QueryShape]:
+    """Every sort offered by GET /products/, with and without each filter and a cursor."""
+    last_seen = {"_id": ObjectId(), "created_at": datetime(2024, 1, 1), "price": 10.0, "title": "lamp"}
+    shapes = []
+    for sort_name, sort in LISTING_SORTS.items():
+        for category in (None, "books"):
+            for min_price, max_price in ((None, None), (10.0, 100.0)):
+                for cursor in (None, encode_cursor(last_seen, sort)):
+                    name = f"products: {sort_name}"
+                    name += ", category" if category else ""
+                    name += ", price range" if min_price is not None else ""
+                    name += ", after cursor" if cursor else ""
+                    query = apply_cursor(listing_filter(category, min_price, max_price), sort, cursor)
+                    shapes.append(QueryShape(name, "products", query, sort, listing_index(sort_name, bool(category))))
+    return shapes
+
+
+# Placeholder values only matter for their type; the planner picks by shape
+QUERY_SHAPES: List[QueryShape] = _listing_shapes() + [
+    QueryShape("auth: user by email", "users", {"email": "someone@example.com"}),
+    QueryShape("products: by owner", "products", {"owner_id": "000000000000000000000000"}),
+    QueryShape("products: search", "products", {"search_terms.t": {"$all": ["lamp"]}}),
+    QueryShape(
+        "purchases: history",
+        "purchases",
+        {"user_id": "000000000000000000000000"},
+        HISTORY_SORT,
+    ),
+    QueryShape("cart: by user", "carts", {"_id": "000000000000000000000000"}),
+    QueryShape(
+        "seller_rollups: dashboard window",
+        "seller_rollups",
+        {"seller_id": "000000000000000000000000", "day": {"$gte": datetime(2024, 1, 1)}},
+    ),
+    QueryShape("product_stats: trending", "product_stats", {}, [(TRENDING_SCORE_FIELD, DESCENDING)]),
+    QueryShape(
+        "jobs: recovery",
+        "jobs",
+        {"status": "pending", "locked_until": {"$lt": datetime(2024, 1, 1)}, "name": {"$in": ["facets.record_change"]}},
+    ),
+]
+
+
+async def ensure_indexes():
+    for collection, indexes in INDEXES.items():
+        await db[collection].create_indexes(indexes)
+
+
+def _plan_stages(plan: dict) -> List[str]:
+    stages = [plan.get("stage")]
+    for key in ("inputStage", "queryPlan"):
+        if key in plan:
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+
+async def explain_shape(shape: QueryShape) -> List[str]:
+    cursor = db[shape.collection].find(shape.filter)
+    if shape.sort:
+        cursor = cursor.sort(shape.sort)
+    if shape.hint:
+        cursor = cursor.hint(shape.hint)
+    explained = await cursor.explain()
+    return _plan_stages(explained["queryPlanner"]["winningPlan"])
+
+
+async def check_query_plans():
+    problems = []
+    for shape in QUERY_SHAPES:
+        stages = await explain_shape(shape)
+        if "COLLSCAN" in stages:
+            problems.append(f"{shape.name} ({shape.collection}): COLLSCAN")
+        # A blocking SORT stage means the order isn't coming from an index
+        if shape.sort and "SORT" in stages:
+            problems.append(f"{shape.name} ({shape.collection}): in-memory SORT")
+    if problems:
+        raise RuntimeError("Unindexed query shapes:\n  " + "\n  ".join(problems))
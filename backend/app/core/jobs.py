@@ -0,0 +1,262 @@
+# File: backend/app/core/jobs.py
+#
+# In-process background jobs for work that doesn't need to finish before the
+# response is sent. Handlers register under a name with @job; enqueue() hands
+# a payload to the handler's queue, where a fixed number of workers run it.
+# Failed jobs are retried with exponential backoff. With JOB_PERSIST on, jobs
+# of handlers registered with persist=True are also written to the `jobs`
+# collection until they succeed; each process renews the leases of the jobs
+# it holds, and periodically takes over jobs whose lease ran out because
+# their process crashed or restarted. Delivery is at-least-once, so handlers
+# should be idempotent; a handler registered with pass_job_id=True receives
+# a `job_id` that stays the same across retries and recoveries.
+#
+# Persisting costs an insert on the enqueueing request and a delete later, so
+# handlers whose effects are also repaired some other way (e.g. a periodic
+# reconciliation) register with persist=False.
+
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Set
+from bson.objectid import ObjectId
+from pymongo import ASCENDING, IndexModel, ReturnDocument
+from app.core.config import settings
+from app.core.database import db
+from app.core.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Registered in app.core.indexes; used to find jobs to recover
+RECOVERY_INDEX = IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)], name="jobs_status_locked_until")
+
+queue_depth = Gauge("job_queue_depth", "Jobs waiting to run, including scheduled retries", ("queue",))
+job_wait = Histogram("job_wait_seconds", "Time from a job becoming due to a worker starting it", ("queue",))
+job_duration = Histogram("job_duration_seconds", "Job handler latency", ("queue", "job"))
+job_outcomes = Counter("jobs_total", "Finished job attempts", ("queue", "job", "outcome"))
+
+
+class Handler(NamedTuple):
+    func: Callable[..., Awaitable[None]]
+    queue: str
+    max_attempts: int
+    persist: bool
+    pass_job_id: bool
+
+    def call(self, job_id: ObjectId, payload: dict) -> Awaitable[None]:
+        if self.pass_job_id:
+            return self.func(job_id=str(job_id), **payload)
+        return self.func(**payload)
+
+
+class Job(NamedTuple):
+    id: ObjectId
+    name: str
+    payload: dict
+    attempts: int
+    due: float  # time.monotonic() when the job became runnable
+    persisted: bool = False
+
+
+_handlers: Dict[str, Handler] = {}
+
+
+def job(name: str, queue: str = "default", max_attempts: int = 5, persist: bool = True, pass_job_id: bool = False):
+    """Register a coroutine function as the handler for jobs called `name`."""
+    def decorator(func):
+        _handlers[name] = Handler(func, queue, max_attempts, persist, pass_job_id)
+        return func
+    return decorator
+
+
+def _backoff(attempts: int) -> float:
+    delay = min(settings.JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_SECONDS)
+    # Jitter spreads out retries of jobs that failed together
+    return delay * random.uniform(0.5, 1.0)
+
+
+class JobRunner:
+    def __init__(self):
+        self._queues: Dict[str, asyncio.Queue] = {}
+        self._workers: List[asyncio.Task] = []
+        self._retries: Dict[ObjectId, asyncio.TimerHandle] = {}
+        self._held: Set[ObjectId] = set()  # Persisted jobs this process has queued, running or scheduled
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    async def start(self) -> None:
+        # Queues a handler names but settings don't size get a single worker
+        sizes = {**{handler.queue: 1 for handler in _handlers.values()}, **settings.JOB_QUEUES}
+        for queue, concurrency in sizes.items():
+            self._queues[queue] = asyncio.Queue()
+            for _ in range(concurrency):
+                self._workers.append(asyncio.create_task(self._work(queue)))
+        self._running = True
+        if settings.JOB_PERSIST:
+            await self._recover()
+            # Cancelled with the workers in stop()
+            self._workers.append(asyncio.create_task(self._maintain_leases()))
+
+    async def stop(self) -> None:
+        """Work through queued jobs for up to JOB_DRAIN_SECONDS, then cancel the rest.
+
+        Scheduled retries are dropped; persisted jobs that didn't finish stay in
+        Mongo and are recovered by the next process to start.
+        """
+        self._running = False
+        for handle in self._retries.values():
+            handle.cancel()
+        self._retries.clear()
+        if self._queues:
+            drained = asyncio.gather(*(queue.join() for queue in self._queues.values()))
+            try:
+                await asyncio.wait_for(drained, settings.JOB_DRAIN_SECONDS)
+            except asyncio.TimeoutError:
+                logger.warning("Cancelling jobs still running after %ss", settings.JOB_DRAIN_SECONDS)
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        for queue in self._queues:
+            queue_depth.set((queue,), 0)
+        self._queues.clear()
+        self._held.clear()
+
+    async def enqueue(self, name: str, **payload) -> None:
+        handler = _handlers[name]
+        job_id = ObjectId()
+        if not self._running:
+            # Scripts and tests run without the lifespan; do the work now
+            await handler.call(job_id, payload)
+            return
+        persisted = settings.JOB_PERSIST and handler.persist
+        if persisted:
+            now = datetime.utcnow()
+            await db.jobs.insert_one({
+                "_id": job_id,
+                "name": name,
+                "queue": handler.queue,
+                "payload": payload,
+                "attempts": 0,
+                "status": "pending",
+                "enqueued_at": now,
+                "locked_until": now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+            })
+            self._held.add(job_id)
+        self._put(Job(job_id, name, payload, 0, time.monotonic(), persisted))
+
+    def _put(self, job: Job) -> None:
+        queue = _handlers[job.name].queue
+        queue_depth.inc((queue,))
+        self._queues[queue].put_nowait(job)
+
+    async def _recover(self) -> None:
+        # A job whose lease ran out belongs to a process that is gone
+        recovered = 0
+        while self._running:
+            now = datetime.utcnow()
+            doc = await db.jobs.find_one_and_update(
+                {"status": "pending", "locked_until": {"$lt": now}, "name": {"$in": list(_handlers)}},
+                {"$set": {"locked_until": now + timedelta(seconds=settings.JOB_LEASE_SECONDS)}},
+                return_document=ReturnDocument.AFTER,
+            )
+            if doc is None:
+                break
+            self._held.add(doc["_id"])
+            self._put(Job(doc["_id"], doc["name"], doc.get("payload", {}), doc.get("attempts", 0), time.monotonic(), True))
+            recovered += 1
+        if recovered:
+            logger.info("Recovered %d pending jobs", recovered)
+
+    async def _maintain_leases(self) -> None:
+        # Keep other processes off the jobs held here, however long they wait
+        # in a queue, and take over jobs whose owner stopped renewing them
+        while True:
+            await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+            try:
+                if self._held:
+                    await db.jobs.update_many(
+                        {"_id": {"$in": list(self._held)}, "status": "pending"},
+                        {"$set": {"locked_until": datetime.utcnow() + timedelta(seconds=settings.JOB_LEASE_SECONDS)}},
+                    )
+                await self._recover()
+            except Exception:
+                logger.exception("Renewing job leases failed")
+
+    async def _work(self, queue_name: str) -> None:
+        queue = self._queues[queue_name]
+        while True:
+            job = await queue.get()
+            queue_depth.dec((queue_name,))
+            try:
+                await self._run(queue_name, job)
+            except Exception:
+                logger.exception("Job bookkeeping failed for %s", job.name)
+            finally:
+                queue.task_done()
+
+    async def _run(self, queue_name: str, job: Job) -> None:
+        handler = _handlers[job.name]
+        job_wait.observe((queue_name,), time.monotonic() - job.due)
+        started = time.perf_counter()
+        try:
+            await handler.call(job.id, job.payload)
+        except Exception as exc:
+            job_duration.observe((queue_name, job.name), time.perf_counter() - started)
+            await self._failed(queue_name, job, handler, exc)
+            return
+        job_duration.observe((queue_name, job.name), time.perf_counter() - started)
+        job_outcomes.inc((queue_name, job.name, "succeeded"))
+        if job.persisted:
+            await db.jobs.delete_one({"_id": job.id})
+            self._held.discard(job.id)
+
+    async def _failed(self, queue_name: str, job: Job, handler: Handler, exc: Exception) -> None:
+        attempts = job.attempts + 1
+        if attempts >= handler.max_attempts:
+            logger.error("Job %s failed after %d attempts", job.name, attempts, exc_info=exc)
+            job_outcomes.inc((queue_name, job.name, "failed"))
+            if job.persisted:
+                await db.jobs.update_one(
+                    {"_id": job.id},
+                    {"$set": {"status": "failed", "attempts": attempts, "error": repr(exc)}},
+                )
+                self._held.discard(job.id)
+            return
+
+        delay = _backoff(attempts)
+        logger.warning("Job %s failed (attempt %d), retrying in %.1fs: %r", job.name, attempts, delay, exc)
+        job_outcomes.inc((queue_name, job.name, "retried"))
+        if job.persisted:
+            await db.jobs.update_one(
+                {"_id": job.id},
+                {"$set": {
+                    "attempts": attempts,
+                    "error": repr(exc),
+                    "locked_until": datetime.utcnow() + timedelta(seconds=delay + settings.JOB_LEASE_SECONDS),
+                }},
+            )
+        if not self._running:
+            self._held.discard(job.id)  # Left for the next process to recover
+            return
+        retry = job._replace(attempts=attempts)
+        queue_depth.inc((queue_name,))
+
+        def resubmit():
+            self._retries.pop(job.id, None)
+            queue_depth.dec((queue_name,))
+            self._put(retry._replace(due=time.monotonic()))
+
+        self._retries[job.id] = asyncio.get_running_loop().call_later(delay, resubmit)
+
+
+runner = JobRunner()
+
+
+async def enqueue(name: str, **payload) -> None:
+    await runner.enqueue(name, **payload)
@@ -0,0 +1,299 @@
+# File: backend/app/core/metrics.py
+#
+# Minimal Prometheus instrumentation: metric types, an ASGI middleware for
+# per-route latency, and a pymongo CommandListener for per-command latency.
+# Everything is rendered in the Prometheus text format by render().
+
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+from pymongo import monitoring
+from app.core.config import settings
+
+logger = logging.getLogger("app.slow_requests")
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_metrics: List["_Metric"] = []
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # pymongo listeners run on Motor's executor threads
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, labels: Tuple = (), amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, labels)} {value}" for labels, value in items]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, labels: Tuple = (), amount: float = 1.0) -> None:
+        self.inc(labels, -amount)
+
+    def set(self, labels: Tuple, value: float) -> None:
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+        # labels -> ([count per bucket ..., +Inf], sum)
+        self._values: Dict[Tuple, Tuple[List[int], float]] = {}
+
+    def observe(self, labels: Tuple, value: float) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(labels) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[index] += 1
+            self._values[labels] = (counts, total + value)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(labels, list(counts), total) for labels, (counts, total) in self._values.items()]
+        lines = []
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+def register_stats(prefix: str, documentation: str, stats: Callable[[], Dict[str, float]]) -> None:
+    """Expose a component's stats() dict as gauges named <prefix>_<key>."""
+    def collect() -> List[str]:
+        lines = []
+        for key, value in stats().items():
+            if isinstance(value, (int, float)):
+                name = f"{prefix}_{key}"
+                lines += [f"# HELP {name} {documentation} ({key})", f"# TYPE {name} gauge", f"{name} {value}"]
+        return lines
+    _collectors.append(collect)
+
+
+def render() -> str:
+    lines: List[str] = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        lines.extend(collect())
+    return "\n".join(lines) + "\n"
+
+
+# --- HTTP -----------------------------------------------------------------
+
+http_request_duration = Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template", ("method", "route", "status")
+)
+http_requests_in_flight = Gauge("http_requests_in_flight", "HTTP requests currently being served", ("method",))
+
+# Mongo commands issued by the current request, for the slow-request log.
+# Motor copies the context into its executor threads, so the listener sees it.
+_request_commands: ContextVar[Optional[List[Tuple[str, str, float]]]] = ContextVar("request_commands", default=None)
+
+
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+        commands: List[Tuple[str, str, float]] = []
+        token = _request_commands.set(commands)
+        http_requests_in_flight.inc((method,))
+        started = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            http_requests_in_flight.dec((method,))
+            _request_commands.reset(token)
+            # The router stores the matched route in the shared scope
+            route = scope.get("route")
+            template = getattr(route, "path", "unmatched")
+            http_request_duration.observe((method, template, str(status_code)), duration)
+            if settings.SLOW_REQUEST_MS and duration * 1000 >= settings.SLOW_REQUEST_MS:
+                logger.warning(
+                    "Slow request %s %s -> %s in %.1f ms; mongo: %s",
+                    method, scope.get("path"), status_code, duration * 1000,
+                    ", ".join(f"{cmd} {coll} {ms:.1f}ms" for cmd, coll, ms in commands) or "none",
+                )
+
+
+# --- MongoDB --------------------------------------------------------------
+
+mongo_command_duration = Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency", ("collection", "command")
+)
+mongo_documents_returned = Counter(
+    "mongodb_documents_returned_total", "Documents returned by MongoDB cursors", ("collection", "command")
+)
+mongo_command_failures = Counter(
+    "mongodb_command_failures_total", "Failed MongoDB commands", ("collection", "command")
+)
+
+# Commands whose first argument is not a collection name
+_NON_COLLECTION_COMMANDS = {"hello", "ismaster", "isMaster", "ping", "endSessions", "commitTransaction",
+                            "abortTransaction", "buildInfo", "saslStart", "saslContinue", "listDatabases"}
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    def __init__(self):
+        self._pending: Dict[int, Tuple[str, Optional[List]]] = {}
+
+    def started(self, event):
+        command = event.command
+        if event.command_name == "getMore":
+            collection = command.get("collection", "")
+        elif event.command_name in _NON_COLLECTION_COMMANDS:
+            collection = ""
+        else:
+            value = command.get(event.command_name)
+            collection = value if isinstance(value, str) else ""
+        self._pending[event.request_id] = (collection, _request_commands.get())
+
+    def succeeded(self, event):
+        collection, commands = self._pending.pop(event.request_id, ("", None))
+        labels = (collection, event.command_name)
+        seconds = event.duration_micros / 1_000_000
+        mongo_command_duration.observe(labels, seconds)
+        cursor = event.reply.get("cursor") if isinstance(event.reply, dict) else None
+        if cursor:
+            batch = cursor.get("firstBatch", cursor.get("nextBatch", []))
+            mongo_documents_returned.inc(labels, len(batch))
+        if commands is not None:
+            commands.append((event.command_name, collection, seconds * 1000))
+
+    def failed(self, event):
+        collection, commands = self._pending.pop(event.request_id, ("", None))
+        mongo_command_failures.inc((collection, event.command_name))
+        mongo_command_duration.observe((collection, event.command_name), event.duration_micros / 1_000_000)
+        if commands is not None:
+            commands.append((f"{event.command_name} (failed)", collection, event.duration_micros / 1000))
+
+
+# --- Connection pool ------------------------------------------------------
+
+mongo_pool_connections = Gauge("mongodb_pool_connections", "Open pooled connections", ("server",))
+mongo_pool_checked_out = Gauge("mongodb_pool_checked_out", "Pooled connections in use", ("server",))
+mongo_pool_max_size = Gauge("mongodb_pool_max_size", "Configured maxPoolSize", ("server",))
+mongo_pool_wait = Histogram(
+    "mongodb_pool_wait_seconds", "Time spent waiting to check out a connection", ("server",),
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0),
+)
+mongo_pool_checkout_failures = Counter(
+    "mongodb_pool_checkout_failures_total", "Failed connection checkouts", ("server", "reason")
+)
+
+
+class MongoPoolListener(monitoring.ConnectionPoolListener):
+    """Pool saturation: checked_out close to max_size plus rising wait times means the pool is too small."""
+
+    def __init__(self):
+        # Checkouts block the calling thread, so a thread-local marks the start
+        self._local = threading.local()
+
+    @staticmethod
+    def _server(event) -> str:
+        host, port = event.address
+        return f"{host}:{port}"
+
+    def pool_created(self, event):
+        mongo_pool_max_size.set((self._server(event),), event.options.get("maxPoolSize", 100))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        mongo_pool_connections.inc((self._server(event),))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        mongo_pool_connections.dec((self._server(event),))
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        mongo_pool_checkout_failures.inc((self._server(event), str(event.reason)))
+
+    def connection_checked_out(self, event):
+        server = self._server(event)
+        mongo_pool_checked_out.inc((server,))
+        started = getattr(self._local, "started", None)
+        if started is not None:
+            mongo_pool_wait.observe((server,), time.perf_counter() - started)
+            self._local.started = None
+
+    def connection_checked_in(self, event):
+        mongo_pool_checked_out.dec((self._server(event),))
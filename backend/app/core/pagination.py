@@ -0,0 +1,85 @@
+# File: backend/app/core/pagination.py
+
+import base64
+from typing import Any, List, Optional, Tuple
+from bson import json_util
+from fastapi import HTTPException, status
+from pymongo import ASCENDING, DESCENDING
+
+# A sort spec is a list of (field, direction) pairs; "_id" is always appended
+# as the final tie-breaker so every document has a unique position.
+SortSpec = List[Tuple[str, int]]
+
+
+def with_tiebreaker(sort: SortSpec) -> SortSpec:
+    if sort and sort[-1][0] == "_id":
+        return list(sort)
+    direction = sort[-1][1] if sort else DESCENDING
+    return list(sort) + [("_id", direction)]
+
+
+def _get_path(doc: dict, field: str) -> Any:
+    value = doc
+    for part in field.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(part)
+    return value
+
+
+def _sort_key(sort: SortSpec) -> str:
+    return ",".join(f"{field}:{direction}" for field, direction in sort)
+
+
+def encode_cursor(doc: dict, sort: SortSpec) -> str:
+    # The sort is encoded with the values so a cursor taken from one order
+    # is rejected by another instead of silently skipping or repeating rows
+    values = [_get_path(doc, field) for field, _ in sort]
+    raw = json_util.dumps({"sort": _sort_key(sort), "after": values}).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: SortSpec) -> List[Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        decoded = json_util.loads(base64.urlsafe_b64decode(padded.encode()))
+    except Exception:
+        decoded = None
+    values = decoded.get("after") if isinstance(decoded, dict) else None
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    if decoded.get("sort") != _sort_key(sort):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor does not match the requested sort"
+        )
+    return values
+
+
+def keyset_filter(sort: SortSpec, values: List[Any]) -> dict:
+    # (a, b, _id) > (va, vb, vid) expands to
+    # a > va OR (a == va AND b > vb) OR (a == va AND b == vb AND _id > vid)
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {f: values[j] for j, (f, _) in enumerate(sort[:i])}
+        op = "$gt" if direction == ASCENDING else "$lt"
+        clause[field] = {op: values[i]}
+        clauses.append(clause)
+    if len(clauses) == 1:
+        return clauses[0]
+    # The $or alone gives the planner no bounds on the sort index; this
+    # redundant range on the leading field does, so the scan starts at the cursor
+    leading, direction = sort[0]
+    return {leading: {"$gte" if direction == ASCENDING else "$lte": values[0]}, "$or": clauses}
+
+
+def apply_cursor(query: dict, sort: SortSpec, cursor: Optional[str]) -> dict:
+    if not cursor:
+        return query
+    after = keyset_filter(sort, decode_cursor(cursor, sort))
+    if not query:
+        return after
+    return {"$and": [query, after]}
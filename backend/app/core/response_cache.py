@@ -0,0 +1,151 @@
+# File: backend/app/core/response_cache.py
+
+import asyncio
+import hashlib
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, NamedTuple, Set, Tuple
+from fastapi import Request, Response
+from app.core.cache import TTLCache
+from app.core.serialization import dumps
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+    headers: Dict[str, str]
+
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    # If-None-Match uses weak comparison, so W/"x" matches "x"
+    return "*" in candidates or any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+class ResponseCache:
+    """Serialized response bodies keyed by request parameters.
+
+    Entries carry tags so writes can drop exactly the responses they affect.
+    Concurrent misses for the same key share a single load.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl, on_evict=self._forget)
+        self._tags: Dict[str, Set[Hashable]] = defaultdict(set)
+        # The reverse of _tags, so a dropped entry leaves no key behind
+        self._key_tags: Dict[Hashable, Tuple[str, ...]] = {}
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # A load that overlaps an invalidation of one of its own tags (or a
+        # clear) is served but not stored. Each invalidation stamps its tags
+        # and prefixes with a tick of _clock; stamps are only compared against
+        # loads in flight, so they are dropped whenever none are.
+        self._clock = 0
+        self._cleared_at = 0
+        self._invalidated: Dict[str, int] = {}
+        self._invalidated_prefixes: Dict[str, int] = {}
+        self.coalesced = 0
+
+    def get(self, key: Hashable) -> CachedResponse | None:
+        return self._entries.get(key)
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        tags: Iterable[str],
+        loader: Callable[[], Awaitable[Tuple[Any, Dict[str, str]]]],
+    ) -> CachedResponse:
+        entry = self._entries.get(key)
+        if entry is not None:
+            return entry
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        # Nobody may be waiting on a failed load; don't warn about it
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._inflight[key] = future
+        tags = tuple(tags)
+        started = self._clock
+        try:
+            content, headers = await loader()
+            body = dumps(content)
+            entry = CachedResponse(body, make_etag(body), headers)
+            if not self._invalidated_since(started, tags):
+                self._forget(key)
+                self._key_tags[key] = tags
+                for tag in self._key_tags[key]:
+                    self._tags[tag].add(key)
+                self._entries.set(key, entry)
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            if not self._inflight:
+                self._invalidated.clear()
+                self._invalidated_prefixes.clear()
+
+    def _invalidated_since(self, started: int, tags: Tuple[str, ...]) -> bool:
+        if self._cleared_at > started:
+            return True
+        if any(self._invalidated.get(tag, started) > started for tag in tags):
+            return True
+        return any(
+            at > started and tag.startswith(prefix)
+            for prefix, at in self._invalidated_prefixes.items()
+            for tag in tags
+        )
+
+    def _tick(self) -> int:
+        self._clock += 1
+        return self._clock
+
+    def _forget(self, key: Hashable) -> None:
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def invalidate_tags(self, *tags: str) -> None:
+        now = self._tick()
+        for tag in tags:
+            if self._inflight:
+                self._invalidated[tag] = now
+            for key in list(self._tags.get(tag, ())):
+                self._entries.invalidate(key)
+                self._forget(key)
+
+    def invalidate_tag_prefix(self, prefix: str) -> None:
+        if self._inflight:
+            self._invalidated_prefixes[prefix] = self._tick()
+        self.invalidate_tags(*[tag for tag in self._tags if tag.startswith(prefix)])
+
+    def clear(self) -> None:
+        self._cleared_at = self._tick()
+        self._tags.clear()
+        self._key_tags.clear()
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {**self._entries.stats(), "coalesced": self.coalesced}
+
+
+def cached_response(request: Request, entry: CachedResponse, cache_control: str) -> Response:
+    headers = {"ETag": entry.etag, "Cache-Control": cache_control, **entry.headers}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
@@ -0,0 +1,45 @@
+# File: backend/app/core/serialization.py
+#
+# JSON encoding for hot listing routes. Handlers build plain dicts straight
+# from Mongo documents and encode them once with orjson, instead of building
+# Pydantic models that FastAPI validates again through response_model and
+# then encodes with the stdlib encoder. orjson is in requirements.txt; when it
+# is missing anyway this falls back to json, much slower, and says so at
+# import.
+
+import json
+import logging
+from datetime import datetime
+from typing import Any
+from bson.objectid import ObjectId
+from fastapi import Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+    logging.getLogger(__name__).warning("orjson is not installed; encoding responses with the slower stdlib json")
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.dict(by_alias=True)
+    if isinstance(value, datetime):  # Only reached on the stdlib path
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default)
+    return json.dumps(content, default=_default, separators=(",", ":")).encode()
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
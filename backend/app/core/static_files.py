@@ -0,0 +1,47 @@
+# File: backend/app/core/static_files.py
+#
+# Serves the upload directory. Stored images are content-addressed, so their
+# responses are marked immutable and the file name doubles as the ETag. A
+# conditional request is answered from a stat() alone and the file is never
+# opened. Anything that isn't a stored image name, such as an upload still
+# being written to a temp file, is a 404. FileResponse handles Range requests.
+# When the server supports the http.response.pathsend extension (Granian, for
+# example), FileResponse hands it the path so the file is sent zero-copy.
+
+import os
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+from app.services.images import STORED_NAME_RE
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+class UploadFiles(StaticFiles):
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if not STORED_NAME_RE.match(path):
+            raise HTTPException(status_code=404)
+        return await super().get_response(path, scope)
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        # FileResponse opens the file only when it is sent
+        response = FileResponse(
+            full_path,
+            status_code=status_code,
+            stat_result=stat_result,
+            headers={"Cache-Control": IMMUTABLE},
+        )
+        # The name is the content hash plus variant size and format, so it is a
+        # strong ETag; the extension stays in, as <digest>.jpg and <digest>.webp differ
+        response.headers["etag"] = '"' + os.path.basename(full_path) + '"'
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
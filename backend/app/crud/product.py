@@ -1,33 +1,170 @@
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+from pymongo import ASCENDING, DESCENDING
 from app.core.database import db
+from app.core.pagination import SortSpec, apply_cursor, encode_cursor, with_tiebreaker
 from app.schemas.product import ProductCreate, ProductRead
+from app.services import facets, popularity, similar
+from app.services import search as product_search
+from app.services.product_cache import invalidate_product
 from bson.objectid import ObjectId
 from datetime import datetime
 
 async def create_product(product: ProductCreate, owner_id: str) -> ProductRead:
     doc = product.dict()
     doc.update({"owner_id": owner_id, "created_at": datetime.utcnow()})
+    doc[product_search.SEARCH_FIELD] = product_search.build_search_terms(doc)
     result = await db.products.insert_one(doc)
     doc["_id"] = str(result.inserted_id)
+    invalidate_product(doc["_id"], doc["category"])
+    await facets.schedule_change(None, doc)
+    await similar.schedule_update(doc["_id"])
     return ProductRead(**doc)
 
-async def get_products(limit: int = 10, offset: int = 0, category: Optional[str] = None, search: Optional[str] = None) -> List[ProductRead]:
+DEFAULT_SORT: SortSpec = with_tiebreaker([("created_at", DESCENDING)])
+SEARCH_SORT: SortSpec = with_tiebreaker([("score", DESCENDING)])
+
+# Listing orders offered by GET /products/?sort=
+LISTING_SORTS: Dict[str, SortSpec] = {
+    "newest": DEFAULT_SORT,
+    "price_asc": with_tiebreaker([("price", ASCENDING)]),
+    "price_desc": with_tiebreaker([("price", DESCENDING)]),
+    "title": with_tiebreaker([("title", ASCENDING)]),
+}
+
+# The index each order reads from (a descending sort walks an ascending index
+# backwards). app.core.indexes creates each one with and without a category
+# prefix, and listings hint them so the planner can never pick a price-range
+# index and then sort in memory.
+LISTING_INDEX_KEYS: Dict[str, SortSpec] = {
+    "newest": DEFAULT_SORT,
+    "price_asc": [("price", ASCENDING), ("_id", ASCENDING)],
+    "price_desc": [("price", ASCENDING), ("_id", ASCENDING)],
+    "title": [("title", ASCENDING), ("_id", ASCENDING)],
+}
+
+def listing_index(sort: str, by_category: bool = False) -> SortSpec:
+    keys = LISTING_INDEX_KEYS[sort]
+    return [("category", ASCENDING)] + keys if by_category else list(keys)
+
+# Only the fields ProductRead exposes; search postings and other internals
+# never leave Mongo
+READ_PROJECTION = {
+    "title": 1, "description": 1, "category": 1, "price": 1,
+    "image_url": 1, "thumbnail_url": 1, "owner_id": 1, "created_at": 1,
+}
+
+def product_json(doc: dict) -> dict:
+    """Turn a projected product document into ProductRead's JSON shape in one pass."""
+    return {
+        "title": doc.get("title"),
+        "description": doc.get("description"),
+        "category": doc.get("category"),
+        "price": float(doc.get("price", 0)),
+        "image_url": doc.get("image_url"),
+        "thumbnail_url": doc.get("thumbnail_url"),
+        "_id": str(doc["_id"]),
+        "owner_id": doc.get("owner_id"),
+        "created_at": doc.get("created_at"),
+    }
+
+def listing_filter(
+    category: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> dict:
     query = {}
     if category:
         query["category"] = category
+    price = {}
+    if min_price is not None:
+        price["$gte"] = min_price
+    if max_price is not None:
+        price["$lte"] = max_price
+    if price:
+        query["price"] = price
+    return query
+
+async def get_product_docs_page(
+    limit: int = 10,
+    offset: int = 0,
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    sort: Optional[str] = None,
+) -> Tuple[List[dict], Optional[str]]:
+    """One page of products; `sort` is a LISTING_SORTS key, or None for newest (relevance when searching)."""
+    query = listing_filter(category, min_price, max_price)
+
     if search:
-        query["title"] = {"$regex": search, "$options": "i"}
+        terms = product_search.query_terms(search)
+        if not terms:
+            return [], None
+        query.update(product_search.match_filter(terms))
+        # Matches are scored in the pipeline anyway, so any order sorts the same set
+        sort_spec = LISTING_SORTS[sort] if sort else SEARCH_SORT
+        pipeline = [
+            {"$match": query},
+            {"$addFields": {"score": product_search.score_expression(terms)}},
+        ]
+        if cursor:
+            pipeline.append({"$match": apply_cursor({}, sort_spec, cursor)})
+        pipeline.append({"$sort": dict(sort_spec)})
+        if offset and not cursor:
+            pipeline.append({"$skip": offset})
+        pipeline.append({"$limit": limit + 1})
+        pipeline.append({"$project": {**READ_PROJECTION, "score": 1}})
+        docs = await db.products.aggregate(pipeline).to_list(length=limit + 1)
+    else:
+        sort = sort or "newest"
+        sort_spec = LISTING_SORTS[sort]
+        query = apply_cursor(query, sort_spec, cursor)
+        find = (
+            db.products.find(query, READ_PROJECTION)
+            .sort(sort_spec)
+            .hint(listing_index(sort, bool(category)))
+        )
+        # A cursor already encodes the position, so offset only applies without one
+        if offset and not cursor:
+            find = find.skip(offset)
+        # Fetch one extra document to know whether another page exists
+        docs = await find.limit(limit + 1).to_list(length=limit + 1)
 
-    cursor = db.products.find(query).skip(offset).limit(limit)
-    products = []
-    async for doc in cursor:
-        doc["_id"] = str(doc["_id"])
-        products.append(ProductRead(**doc))
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], sort_spec)
+
+    return [product_json(doc) for doc in docs], next_cursor
+
+async def get_products_page(
+    limit: int = 10,
+    offset: int = 0,
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    cursor: Optional[str] = None,
+    **filters,
+) -> Tuple[List[ProductRead], Optional[str]]:
+    docs, next_cursor = await get_product_docs_page(limit, offset, category, search, cursor, **filters)
+    return [ProductRead(**doc) for doc in docs], next_cursor
+
+async def get_products(limit: int = 10, offset: int = 0, category: Optional[str] = None, search: Optional[str] = None, cursor: Optional[str] = None, **filters) -> List[ProductRead]:
+    products, _ = await get_products_page(limit, offset, category, search, cursor, **filters)
     return products
 
+async def get_product_docs_by_ids(product_ids: List[str]) -> List[dict]:
+    # One $in round-trip; results follow the requested order and unknown ids are skipped
+    obj_ids = [ObjectId(pid) for pid in product_ids if ObjectId.is_valid(pid)]
+    found = {}
+    async for doc in db.products.find({"_id": {"$in": obj_ids}}, READ_PROJECTION):
+        product = product_json(doc)
+        found[product["_id"]] = product
+    return [found[pid] for pid in dict.fromkeys(product_ids) if pid in found]
+
 async def get_product(product_id: str) -> Optional[ProductRead]:
     obj_id = ObjectId(product_id)
-    doc = await db.products.find_one({"_id": obj_id})
+    doc = await db.products.find_one({"_id": obj_id}, READ_PROJECTION)
     if doc:
         doc["_id"] = str(doc["_id"])
         return ProductRead(**doc)
@@ -35,16 +172,29 @@ async def get_product(product_id: str) -> Optional[ProductRead]:
 
 async def update_product(product_id: str, product_data: ProductCreate) -> Optional[ProductRead]:
     obj_id = ObjectId(product_id)
+    existing = await db.products.find_one({"_id": obj_id}, READ_PROJECTION)
+    if not existing:
+        return None
     update_data = product_data.dict(exclude_unset=True)
+    update_data[product_search.SEARCH_FIELD] = product_search.build_search_terms({**existing, **update_data})
     result = await db.products.update_one({"_id": obj_id}, {"$set": update_data})
+    invalidate_product(product_id, existing.get("category"), update_data.get("category"))
+    updated = await db.products.find_one({"_id": obj_id}, READ_PROJECTION)
+    if not updated:
+        return None  # Deleted meanwhile
     if result.modified_count == 1:
-        updated = await db.products.find_one({"_id": obj_id})
-        if updated:
-            updated["_id"] = str(updated["_id"])
-            return ProductRead(**updated)
-    return None
+        await facets.schedule_change(existing, updated)
+        await similar.schedule_update(product_id)
+    updated["_id"] = str(updated["_id"])
+    return ProductRead(**updated)
 
 async def delete_product(product_id: str) -> bool:
     obj_id = ObjectId(product_id)
-    result = await db.products.delete_one({"_id": obj_id})
-    return result.deleted_count == 1
+    doc = await db.products.find_one_and_delete({"_id": obj_id}, {"category": 1, "price": 1})
+    if doc is None:
+        return False
+    invalidate_product(product_id, doc.get("category"))
+    await facets.schedule_change(doc, None)
+    await similar.forget_product(product_id)
+    await popularity.forget_product(product_id)
+    return True
@@ -0,0 +1,43 @@
+from typing import List, Optional, Tuple
+from pymongo import DESCENDING
+from app.core.database import db
+from app.core.pagination import SortSpec, apply_cursor, encode_cursor, with_tiebreaker
+
+# Purchase history order; app.core.indexes builds the purchases index from it
+HISTORY_SORT: SortSpec = with_tiebreaker([("purchased_at", DESCENDING)])
+
+# Joins the listing each purchase refers to; purchases store product ids as strings
+PRODUCT_LOOKUP = {
+    "$lookup": {
+        "from": "products",
+        "let": {"product_id": {"$convert": {"input": "$product_id", "to": "objectId", "onError": None}}},
+        "pipeline": [
+            {"$match": {"$expr": {"$eq": ["$_id", "$$product_id"]}}},
+            {"$project": {"title": 1, "price": 1, "image_url": 1, "thumbnail_url": 1}},
+        ],
+        "as": "product",
+    }
+}
+
+PURCHASE_PROJECTION = {
+    "product_id": 1, "quantity": 1, "price": 1, "user_id": 1, "purchased_at": 1,
+    "product": {"$arrayElemAt": ["$product", 0]},
+}
+
+
+async def purchase_history(user_id: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+    """One page of a user's purchases, newest first, each with its product joined in."""
+    query = apply_cursor({"user_id": user_id}, HISTORY_SORT, cursor)
+    pipeline = [
+        {"$match": query},
+        {"$sort": dict(HISTORY_SORT)},
+        {"$limit": limit + 1},
+        PRODUCT_LOOKUP,
+        {"$project": PURCHASE_PROJECTION},
+    ]
+    docs = await db.purchases.aggregate(pipeline).to_list(length=limit + 1)
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1], HISTORY_SORT)
+    return docs, next_cursor
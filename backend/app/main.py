@@ -1,18 +1,54 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.httpsredirect import HTTPSRedirectMiddleware
-from app.api import auth, products, cart, purchases
-from app.core.database import engine
-from app.core.database import Base
-import os
+from app.api import auth, products, cart, purchases, sellers
+from app.core import change_feed, database, jobs, metrics
+from app.core.config import settings
+from app.core.indexes import check_query_plans, ensure_indexes
+from app.core.static_files import UploadFiles
+from app.services import facets, popularity
+from app.services.images import URL_PREFIX as UPLOADS_PREFIX, shutdown_image_pool
+import asyncio
+import logging
 
-# Create all tables (use Alembic or other migrations for production)
-Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI(title="EcoFinds API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await database.open_database()
+    await ensure_indexes()
+    # Catch a missing index before it turns into a collection scan in production
+    if settings.ENV in ("development", "test"):
+        await check_query_plans()
+    await jobs.runner.start()
+    background = [
+        asyncio.create_task(facets.run_reconciler(settings.FACET_RECONCILE_SECONDS)),
+        asyncio.create_task(change_feed.run()),
+        asyncio.create_task(popularity.run_flusher(settings.VIEW_FLUSH_SECONDS)),
+    ]
+    try:
+        yield
+    finally:
+        for task in background:
+            task.cancel()
+        await asyncio.gather(*background, return_exceptions=True)
+        # Views counted since the last periodic flush
+        try:
+            await popularity.views.flush()
+        except Exception:
+            logger.exception("Final flush of product views failed")
+        await jobs.runner.stop()
+        shutdown_image_pool()
+        database.close_database()
+
+
+app = FastAPI(title="EcoFinds API", lifespan=lifespan)
 
 # Enable HTTPS redirect only in production environment
-if os.getenv("ENV", "development") == "production":
+if settings.ENV == "production":
     app.add_middleware(HTTPSRedirectMiddleware)
 
 # Configure allowed frontend origins for CORS
@@ -29,10 +65,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],    # Allow all HTTP methods, includes OPTIONS
     allow_headers=["*"],    # Allow all headers, including custom headers
+    expose_headers=["X-Next-Cursor"],  # Let the frontend read pagination cursors
 )
 
+# Outermost, so latency covers every other middleware too
+app.add_middleware(metrics.MetricsMiddleware)
+
 # Register API route groups
 app.include_router(auth.router)
 app.include_router(products.router)
 app.include_router(cart.router)
 app.include_router(purchases.router)
+app.include_router(sellers.router)
+
+# Uploaded images; check_dir is off because the directory appears with the first upload
+app.mount(UPLOADS_PREFIX, UploadFiles(directory=settings.UPLOAD_DIR, check_dir=False), name="uploads")
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
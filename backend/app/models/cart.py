@@ -1,20 +1,18 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Dict, Optional
 from datetime import datetime
 
-class CartItemBase(BaseModel):
-    user_id: str       # MongoDB ObjectId as string
-    product_id: str    # MongoDB ObjectId as string
-    quantity: Optional[int] = 1   # Default quantity is 1
-    added_at: Optional[datetime] = None
-
-class CartItemCreate(CartItemBase):
-    pass
-
-class Cart(CartItemBase):
-    id: str = Field(..., alias="_id")
+class CartLine(BaseModel):
+    quantity: int = 1
     added_at: datetime
 
+class Cart(BaseModel):
+    # One document per user in the `carts` collection
+    id: str = Field(..., alias="_id")   # The owner's user id
+    items: Dict[str, CartLine] = {}     # Keyed by product id (MongoDB ObjectId as string)
+    version: int = 0                    # Bumped by every change
+    updated_at: Optional[datetime] = None
+
     class Config:
         allow_population_by_field_name = True
         json_encoders = {
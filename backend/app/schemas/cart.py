@@ -1,15 +1,27 @@
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Optional
+from datetime import datetime
+from app.schemas.purchase import PurchasedProduct
 
 class CartItemBase(BaseModel):
-    product_id: int
+    product_id: str
+    quantity: int = Field(1, ge=1)
 
 class CartItemCreate(CartItemBase):
     pass
 
 class CartItemRead(CartItemBase):
-    id: int
-    user_id: int
+    added_at: datetime
 
-    class Config:
-        orm_mode = True
+class CartLineRead(CartItemRead):
+    product: Optional[PurchasedProduct] = None  # None once the listing is deleted
+
+class CartRead(BaseModel):
+    items: List[CartLineRead]
+    total: float  # Sum of current listing prices times quantities
+
+class CartBatch(BaseModel):
+    add: List[CartItemCreate] = []     # Quantities merge into existing lines
+    update: List[CartItemCreate] = []  # Quantities replace existing lines
+    remove: List[str] = []             # Product ids
@@ -7,7 +7,8 @@ class ProductBase(BaseModel):
     description: str
     category: str
     price: float
-    image_url: Optional[str]
+    image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
 
 class ProductCreate(ProductBase):
     pass
@@ -1,15 +1,30 @@
 # File: backend/app/schemas/purchase.py
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import Optional
 from datetime import datetime
 
 class PurchaseBase(BaseModel):
-    product_id: int
+    product_id: str
+    quantity: int = 1
+    price: Optional[float] = None  # Unit price at the time of purchase
+
+class PurchasedProduct(BaseModel):
+    # Current listing details joined in from the products collection
+    id: str = Field(..., alias="_id")
+    title: str
+    price: float
+    image_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+
+    class Config:
+        allow_population_by_field_name = True
 
 class PurchaseRead(PurchaseBase):
-    id: int
-    user_id: int
+    id: str = Field(..., alias="_id")
+    user_id: str
     purchased_at: datetime
+    product: Optional[PurchasedProduct] = None  # None once the listing is deleted
 
     class Config:
-        orm_mode = True
+        allow_population_by_field_name = True
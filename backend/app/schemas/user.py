@@ -1,5 +1,5 @@
 
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -9,10 +9,10 @@ class UserCreate(UserBase):
     password: str
 
 class UserRead(UserBase):
-    id: int
+    id: str = Field(..., alias="_id")
 
     class Config:
-        orm_mode = True
+        allow_population_by_field_name = True
 
 class UserLogin(BaseModel):
     email: EmailStr
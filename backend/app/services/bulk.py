@@ -0,0 +1,154 @@
+# File: backend/app/services/bulk.py
+#
+# Streaming product import (NDJSON or CSV) and NDJSON export. Request bodies
+# are parsed line by line as they arrive and written in insert_many batches,
+# and exports stream straight off a Motor cursor, so memory stays flat no
+# matter how many products are involved.
+
+import codecs
+import csv
+import json
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+from bson.objectid import ObjectId
+from pydantic import ValidationError
+from pymongo.errors import BulkWriteError
+from app.core.database import db
+from app.schemas.product import ProductCreate
+from app.services import facets, similar
+from app.services import search as product_search
+from app.services.product_cache import invalidate_listings
+
+BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 1000
+EXPORT_BATCH_SIZE = 500
+
+
+async def _iter_lines(stream: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    async for chunk in stream:
+        buffer += decoder.decode(chunk)
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            yield line + "\n"
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+async def _iter_ndjson(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    row = 0
+    async for line in _iter_lines(stream):
+        if not line.strip():
+            continue
+        row += 1
+        try:
+            yield row, json.loads(line)
+        except json.JSONDecodeError as exc:
+            yield row, ValueError(f"Invalid JSON: {exc.msg}")
+
+
+async def _iter_csv(stream: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    header: Optional[List[str]] = None
+    row = 0
+    pending = ""
+    async for line in _iter_lines(stream):
+        pending += line
+        # A quoted field may span lines; a record is complete once quotes balance
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        row += 1
+        if len(values) != len(header):
+            yield row, ValueError(f"Expected {len(header)} columns, got {len(values)}")
+            continue
+        # Empty cells mean "not provided", so optional fields fall back to defaults
+        yield row, {name: value for name, value in zip(header, values) if value != ""}
+    if pending.strip():
+        yield row + 1, ValueError("Unterminated quoted field")
+
+
+def iter_records(stream: AsyncIterator[bytes], content_type: str) -> AsyncIterator[Tuple[int, object]]:
+    if content_type.split(";")[0].strip().lower() == "text/csv":
+        return _iter_csv(stream)
+    return _iter_ndjson(stream)
+
+
+async def _flush(batch: List[Tuple[int, dict]], report: Dict) -> None:
+    failed = set()
+    try:
+        result = await db.products.insert_many([doc for _, doc in batch], ordered=False)
+        report["inserted"] += len(result.inserted_ids)
+    except BulkWriteError as exc:
+        report["inserted"] += exc.details.get("nInserted", 0)
+        for error in exc.details.get("writeErrors", []):
+            failed.add(error["index"])
+            _add_error(report, batch[error["index"]][0], error.get("errmsg", "Write failed"))
+    inserted = [doc for index, (_, doc) in enumerate(batch) if index not in failed]
+    await facets.record_created(inserted)
+    # insert_many set each document's _id; one job scores the whole batch
+    await similar.schedule_updates([str(doc["_id"]) for doc in inserted])
+
+
+def _add_error(report: Dict, row: int, message: str) -> None:
+    report["failed"] += 1
+    if len(report["errors"]) < MAX_REPORTED_ERRORS:
+        report["errors"].append({"row": row, "error": message})
+
+
+async def import_products(records: AsyncIterator[Tuple[int, object]], owner_id: str) -> Dict:
+    report = {"inserted": 0, "failed": 0, "errors": []}
+    categories = set()
+    batch: List[Tuple[int, dict]] = []
+    now = datetime.utcnow()
+
+    async for row, record in records:
+        if isinstance(record, Exception):
+            _add_error(report, row, str(record))
+            continue
+        if not isinstance(record, dict):
+            _add_error(report, row, "Each row must be an object")
+            continue
+        try:
+            product = ProductCreate(**record)
+        except ValidationError as exc:
+            _add_error(report, row, "; ".join(
+                f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in exc.errors()
+            ))
+            continue
+
+        doc = product.dict()
+        doc.update({"owner_id": owner_id, "created_at": now})
+        doc[product_search.SEARCH_FIELD] = product_search.build_search_terms(doc)
+        categories.add(doc["category"])
+        batch.append((row, doc))
+        if len(batch) >= BATCH_SIZE:
+            await _flush(batch, report)
+            batch = []
+
+    if batch:
+        await _flush(batch, report)
+    if categories:
+        invalidate_listings(*categories)
+    return report
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+async def export_products(query: dict) -> AsyncIterator[bytes]:
+    cursor = db.products.find(query, {product_search.SEARCH_FIELD: 0}).batch_size(EXPORT_BATCH_SIZE)
+    async for doc in cursor:
+        yield (json.dumps(doc, default=_json_default, separators=(",", ":")) + "\n").encode()
@@ -0,0 +1,184 @@
+# File: backend/app/services/carts.py
+#
+# Each user's cart is a single document in `carts`, keyed by user id, with
+# its line items embedded as a map from product id to {quantity, added_at}.
+# Keying lines by product id lets one update_one $inc, $set and $unset any
+# number of them atomically, and adding a product that is already in the
+# cart merges into its line. Reading the cart, product details included, is
+# one aggregation. `python -m app.services.carts` folds rows from the old
+# one-row-per-item `cart` collection into cart documents.
+
+import asyncio
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+from bson.objectid import ObjectId
+from pymongo import ReturnDocument, UpdateOne
+from app.core.database import db
+
+# Listing fields shown next to each line
+PRODUCT_FIELDS = {"title": 1, "price": 1, "image_url": 1, "thumbnail_url": 1}
+
+
+class CartConflict(ValueError):
+    """The same product appears in more than one operation of a batch."""
+
+
+def _line(product_id: str) -> str:
+    # Ids become field paths, so anything but a product id could name another
+    # path ("a.b") or an operator ("$x"); callers validate first
+    if not ObjectId.is_valid(product_id):
+        raise ValueError(f"Not a product id: {product_id!r}")
+    return f"items.{product_id}"
+
+
+def invalid_product_ids(product_ids: Iterable[str]) -> List[str]:
+    return [pid for pid in product_ids if not ObjectId.is_valid(pid)]
+
+
+def build_update(
+    add: Iterable[tuple] = (),
+    update: Iterable[tuple] = (),
+    remove: Iterable[str] = (),
+    now: Optional[datetime] = None,
+) -> dict:
+    """Translate a batch of (product_id, quantity) adds/updates and removals into one update document."""
+    now = now or datetime.utcnow()
+    spec: Dict[str, dict] = {"$inc": {"version": 1}, "$set": {"updated_at": now}}
+    seen = set()
+
+    def claim(product_id: str):
+        # Mongo rejects an update that touches the same path twice
+        if product_id in seen:
+            raise CartConflict(f"Product {product_id} appears more than once in the batch")
+        seen.add(product_id)
+
+    for product_id, quantity in add:
+        claim(product_id)
+        spec["$inc"][f"{_line(product_id)}.quantity"] = quantity
+        # $min keeps the original timestamp when the line already exists
+        spec.setdefault("$min", {})[f"{_line(product_id)}.added_at"] = now
+    for product_id, quantity in update:
+        claim(product_id)
+        spec["$set"][f"{_line(product_id)}.quantity"] = quantity
+        spec.setdefault("$min", {})[f"{_line(product_id)}.added_at"] = now
+    for product_id in remove:
+        claim(product_id)
+        spec.setdefault("$unset", {})[_line(product_id)] = ""
+    return spec
+
+
+async def missing_products(product_ids: Iterable[str]) -> List[str]:
+    wanted = set(product_ids)
+    ids = [ObjectId(pid) for pid in wanted if ObjectId.is_valid(pid)]
+    found = {str(doc["_id"]) async for doc in db.products.find({"_id": {"$in": ids}}, {"_id": 1})}
+    return sorted(wanted - found)
+
+
+async def apply(user_id: str, update: dict) -> dict:
+    return await db.carts.find_one_and_update(
+        {"_id": user_id}, update, upsert=True, return_document=ReturnDocument.AFTER
+    )
+
+
+async def remove_item(user_id: str, product_id: str) -> bool:
+    if not ObjectId.is_valid(product_id):
+        return False  # Can't be in the cart
+    result = await db.carts.update_one(
+        {"_id": user_id, _line(product_id): {"$exists": True}},
+        build_update(remove=[product_id]),
+    )
+    return result.modified_count > 0
+
+
+def _product_json(product: Optional[dict]) -> Optional[dict]:
+    if not product:
+        return None  # Listing deleted since it was added
+    return {
+        "_id": str(product["_id"]),
+        "title": product.get("title"),
+        "price": product.get("price"),
+        "image_url": product.get("image_url"),
+        "thumbnail_url": product.get("thumbnail_url"),
+    }
+
+
+async def read_cart(user_id: str) -> dict:
+    """The cart as {items, total}, each item joined with its listing."""
+    pipeline = [
+        {"$match": {"_id": user_id}},
+        {"$project": {"items": {"$objectToArray": "$items"}}},
+        {"$unwind": "$items"},
+        {"$project": {
+            "product_id": "$items.k",
+            "quantity": "$items.v.quantity",
+            "added_at": "$items.v.added_at",
+            # Keys are validated product ids, so the conversion cannot fail
+            "product_oid": {"$toObjectId": "$items.k"},
+        }},
+        {"$lookup": {
+            "from": "products",
+            "localField": "product_oid",
+            "foreignField": "_id",
+            "pipeline": [{"$project": PRODUCT_FIELDS}],
+            "as": "product",
+        }},
+        {"$sort": {"added_at": 1, "product_id": 1}},
+    ]
+    items = []
+    total = 0.0
+    async for doc in db.carts.aggregate(pipeline):
+        product = _product_json(doc["product"][0] if doc["product"] else None)
+        if product and product["price"] is not None:
+            total += product["price"] * doc["quantity"]
+        items.append({
+            "product_id": doc["product_id"],
+            "quantity": doc["quantity"],
+            "added_at": doc["added_at"],
+            "product": product,
+        })
+    return {"items": items, "total": round(total, 2)}
+
+
+async def clear_for_checkout(user_id: str, version: int, now: Optional[datetime] = None, session=None) -> bool:
+    """Empty the cart if it is still at the version checkout read.
+
+    False means the cart changed in between, or another checkout already
+    emptied it, so the caller must not record the purchases.
+    """
+    result = await db.carts.update_one(
+        {"_id": user_id, "version": version},
+        {"$set": {"items": {}, "updated_at": now or datetime.utcnow()}, "$inc": {"version": 1}},
+        session=session,
+    )
+    return result.matched_count == 1
+
+
+async def migrate_legacy_rows(batch_size: int = 500) -> int:
+    """Merge rows from the old `cart` collection into cart documents, then delete them."""
+    migrated = 0
+    while True:
+        rows = await db.cart.find({}).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not rows:
+            break
+        ops = [
+            UpdateOne(
+                {"_id": row["user_id"]},
+                {
+                    "$inc": {f"{_line(row['product_id'])}.quantity": row.get("quantity", 1), "version": 1},
+                    "$min": {f"{_line(row['product_id'])}.added_at": row.get("added_at") or datetime.utcnow()},
+                },
+                upsert=True,
+            )
+            for row in rows
+            if ObjectId.is_valid(row["product_id"])  # Others can't name a product; dropped
+        ]
+        if ops:
+            await db.carts.bulk_write(ops, ordered=True)
+        await db.cart.delete_many({"_id": {"$in": [row["_id"] for row in rows]}})
+        migrated += len(rows)
+    return migrated
+
+
+if __name__ == "__main__":
+    count = asyncio.run(migrate_legacy_rows())
+    print(f"Moved {count} cart rows into cart documents")
@@ -0,0 +1,228 @@
+# File: backend/app/services/facets.py
+#
+# Category and price-band counts for the browse UI. Unfiltered counts live in
+# the small `product_facets` collection and are adjusted with $inc by every
+# product write, so reading them costs one tiny query. A periodic
+# reconciliation, run by one process per interval, recomputes them from
+# `products` and corrects any drift (e.g. from writes that bypassed the API)
+# with $inc deltas. Filtered requests fall back to a $facet aggregation over
+# the matching products.
+
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from app.core import jobs
+from app.core.database import db
+
+logger = logging.getLogger(__name__)
+
+# Job ids remembered per counter so a replayed job doesn't count twice; a
+# replay arrives within minutes, long before this many later changes
+APPLIED_JOBS_KEPT = 200
+DUPLICATE_KEY = 11000
+
+# (label, lower bound inclusive, upper bound exclusive)
+PRICE_BANDS: List[Tuple[str, float, Optional[float]]] = [
+    ("0-25", 0, 25),
+    ("25-50", 25, 50),
+    ("50-100", 50, 100),
+    ("100-250", 100, 250),
+    ("250-500", 250, 500),
+    ("500+", 500, None),
+]
+
+
+def price_band(price) -> Optional[str]:
+    if price is None:
+        return None
+    for label, low, high in PRICE_BANDS:
+        if price >= low and (high is None or price < high):
+            return label
+    return None
+
+
+def _keys(doc: Optional[dict]) -> List[Tuple[str, str]]:
+    if not doc:
+        return []
+    keys = []
+    if doc.get("category"):
+        keys.append(("category", doc["category"]))
+    band = price_band(doc.get("price"))
+    if band:
+        keys.append(("price", band))
+    return keys
+
+
+async def _apply(deltas: Counter, job_id: Optional[str] = None) -> None:
+    """$inc the counters; with a job_id, each counter takes the job's delta at most once."""
+    ops = []
+    for (kind, value), delta in deltas.items():
+        if not delta:
+            continue
+        query = {"_id": f"{kind}:{value}"}
+        # version lets reconcile() tell whether a counter moved under it
+        update = {"$inc": {"count": delta, "version": 1}, "$setOnInsert": {"kind": kind, "value": value}}
+        if job_id:
+            query["applied"] = {"$ne": job_id}
+            update["$push"] = {"applied": {"$each": [job_id], "$slice": -APPLIED_JOBS_KEPT}}
+        ops.append(UpdateOne(query, update, upsert=True))
+    await _write_ignoring_duplicates(ops)
+
+
+async def _write_ignoring_duplicates(ops: List[UpdateOne]) -> None:
+    if not ops:
+        return
+    try:
+        await db.product_facets.bulk_write(ops, ordered=False)
+    except BulkWriteError as exc:
+        # An upsert whose filter no longer matches the existing counter
+        # collides with it on _id: that counter is to be left alone
+        if any(error["code"] != DUPLICATE_KEY for error in exc.details["writeErrors"]):
+            raise
+
+
+async def record_change(old: Optional[dict], new: Optional[dict], job_id: Optional[str] = None) -> None:
+    """Adjust counters for a create (old=None), update, or delete (new=None)."""
+    deltas = Counter()
+    for key in _keys(old):
+        deltas[key] -= 1
+    for key in _keys(new):
+        deltas[key] += 1
+    await _apply(deltas, job_id)
+
+
+# Not persisted: the reconciler repairs counts a lost job leaves behind, and
+# enqueueing stays free of database writes
+@jobs.job("facets.record_change", persist=False, pass_job_id=True)
+async def _record_change_job(old: Optional[dict], new: Optional[dict], job_id: str) -> None:
+    await record_change(old, new, job_id)
+
+
+def _counted_fields(doc: Optional[dict]) -> Optional[dict]:
+    return {"category": doc.get("category"), "price": doc.get("price")} if doc else None
+
+
+async def schedule_change(old: Optional[dict], new: Optional[dict]) -> None:
+    """Queue record_change to run after the response; only counted fields are kept."""
+    await jobs.enqueue("facets.record_change", old=_counted_fields(old), new=_counted_fields(new))
+
+
+async def record_created(docs: Iterable[dict]) -> None:
+    deltas = Counter()
+    for doc in docs:
+        for key in _keys(doc):
+            deltas[key] += 1
+    await _apply(deltas)
+
+
+def _shape(categories: Dict[str, int], bands: Dict[str, int]) -> dict:
+    return {
+        "categories": [
+            {"value": value, "count": count}
+            for value, count in sorted(categories.items(), key=lambda item: (-item[1], item[0]))
+            if count > 0
+        ],
+        "price_bands": [
+            {"value": label, "count": bands.get(label, 0)}
+            for label, _, _ in PRICE_BANDS
+        ],
+    }
+
+
+async def get_facets() -> dict:
+    categories, bands = {}, {}
+    async for doc in db.product_facets.find({}, {"kind": 1, "value": 1, "count": 1}):
+        target = categories if doc["kind"] == "category" else bands
+        target[doc["value"]] = doc["count"]
+    return _shape(categories, bands)
+
+
+def _band_label_expression() -> dict:
+    branches = []
+    for label, low, high in PRICE_BANDS:
+        conditions = [{"$gte": ["$price", low]}]
+        if high is not None:
+            conditions.append({"$lt": ["$price", high]})
+        branches.append({"case": {"$and": conditions}, "then": label})
+    return {"$switch": {"branches": branches, "default": None}}
+
+
+async def compute_facets(match: dict) -> dict:
+    pipeline = [
+        {"$match": match},
+        {"$facet": {
+            "categories": [{"$group": {"_id": "$category", "count": {"$sum": 1}}}],
+            "price_bands": [{"$group": {"_id": _band_label_expression(), "count": {"$sum": 1}}}],
+        }},
+    ]
+    result = await db.products.aggregate(pipeline).to_list(length=1)
+    facets = result[0] if result else {"categories": [], "price_bands": []}
+    categories = {doc["_id"]: doc["count"] for doc in facets["categories"] if doc["_id"]}
+    bands = {doc["_id"]: doc["count"] for doc in facets["price_bands"] if doc["_id"]}
+    return _shape(categories, bands)
+
+
+async def reconcile() -> None:
+    """Bring the counters to the values computed from products.
+
+    Corrections are $inc deltas applied only to counters whose version is
+    unchanged since before the scan, so a change counted while the scan ran
+    isn't overwritten; a counter that moved is checked again next time.
+    """
+    before = {
+        doc["_id"]: (doc.get("count", 0), doc.get("version"))
+        async for doc in db.product_facets.find({}, {"count": 1, "version": 1})
+    }
+    exact = await compute_facets({})
+    wanted = {f"category:{c['value']}": ("category", c["value"], c["count"]) for c in exact["categories"]}
+    wanted.update({f"price:{b['value']}": ("price", b["value"], b["count"]) for b in exact["price_bands"]})
+    for _id in before:
+        if _id not in wanted:
+            kind, _, value = _id.partition(":")
+            wanted[_id] = (kind, value, 0)
+
+    ops = []
+    for _id, (kind, value, count) in wanted.items():
+        current, version = before.get(_id, (0, None))
+        if count == current:
+            continue
+        # A counter created since the snapshot makes the upsert collide; skipped
+        query = {"_id": _id, "version": version} if version is not None else {"_id": _id, "version": {"$exists": False}}
+        ops.append(UpdateOne(
+            query,
+            {"$inc": {"count": count - current, "version": 1}, "$setOnInsert": {"kind": kind, "value": value}},
+            upsert=True,
+        ))
+    await _write_ignoring_duplicates(ops)
+    if ops:
+        logger.info("Corrected %d facet counters", len(ops))
+    # Safe under concurrent writes: a later $inc simply upserts the counter again
+    await db.product_facets.delete_many({"count": 0, "kind": "category"})
+
+
+async def _claim_run(name: str, interval: float) -> bool:
+    """True for the one process that gets to run `name` in this interval."""
+    now = datetime.utcnow()
+    try:
+        await db.scheduled_runs.update_one(
+            {"_id": name, "next_run_at": {"$lte": now}},
+            {"$set": {"next_run_at": now + timedelta(seconds=interval)}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        return False  # Another process already claimed it
+    return True
+
+
+async def run_reconciler(interval: float) -> None:
+    while True:
+        try:
+            if await _claim_run("facets.reconcile", interval):
+                await reconcile()
+        except Exception:
+            logger.exception("Facet reconciliation failed")
+        await asyncio.sleep(interval)
@@ -0,0 +1,310 @@
+# File: backend/app/services/images.py
+#
+# Upload pipeline for product images. The multipart body is parsed as it
+# streams in, so the size cap and type check apply before the whole upload
+# has been received. The image part is written to disk once, hashed as it
+# arrives and stored under its SHA-256 digest, so the same picture uploaded
+# twice is kept once. Resizing runs in a process pool because
+# Pillow work is CPU bound and would otherwise stall the event loop.
+
+import asyncio
+import hashlib
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+from fastapi import HTTPException, Request, status
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+
+try:
+    import python_multipart as multipart
+    from python_multipart.multipart import parse_options_header
+except ImportError:  # Releases before 0.0.13 ship the module as `multipart`
+    import multipart
+    from multipart.multipart import parse_options_header
+
+URL_PREFIX = "/uploads"
+UPLOAD_FIELD = "file"
+MULTIPART_OVERHEAD = 16 * 1024  # Boundaries and part headers around the image
+SNIFF_BYTES = 12  # Enough for every signature _sniff_type checks
+
+# Names store_image writes: "<sha256>.<ext>" and "<sha256>_<size>.<ext>".
+# Their bytes never change, which is what lets them be cached forever.
+STORED_NAME_RE = re.compile(r"^[0-9a-f]{64}(?:_\d+)?\.(?:jpg|png|gif|webp)$")
+
+# Magic bytes of the formats we accept, mapped to the extension we store
+ALLOWED_TYPES = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+
+_image_executor: ProcessPoolExecutor | None = None
+
+
+def _sniff_type(head: bytes) -> str | None:
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    # Created lazily so importing the app (or forking workers) doesn't spawn processes
+    global _image_executor
+    if _image_executor is None:
+        _image_executor = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS)
+    return _image_executor
+
+
+def shutdown_image_pool() -> None:
+    global _image_executor
+    if _image_executor is not None:
+        _image_executor.shutdown(wait=True)
+        _image_executor = None
+
+
+def _save_variant(image, directory: str, name: str, fmt: str, **params) -> None:
+    # Variants are served as immutable, so a reader must never see one half
+    # written: save to a temp file and rename it into place, as store_image
+    # does with the original. Skipped when an earlier upload already made it.
+    path = os.path.join(directory, name)
+    if os.path.exists(path):
+        return
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            image.save(out, fmt, **params)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _make_variants(source: str, digest: str, directory: str, sizes: List[int]) -> List[str]:
+    # Runs in a worker process; returns the file names it produced
+    from PIL import Image, ImageOps
+
+    produced = []
+    with Image.open(source) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+        webp_name = f"{digest}.webp"
+        _save_variant(image, directory, webp_name, "WEBP", quality=85, method=4)
+        produced.append(webp_name)
+
+        for size in sizes:
+            thumb = image.copy()
+            thumb.thumbnail((size, size), Image.LANCZOS)
+            jpeg_name = f"{digest}_{size}.jpg"
+            webp_name = f"{digest}_{size}.webp"
+            _save_variant(thumb.convert("RGB"), directory, jpeg_name, "JPEG", quality=82, optimize=True, progressive=True)
+            _save_variant(thumb, directory, webp_name, "WEBP", quality=80, method=4)
+            produced.extend([jpeg_name, webp_name])
+    return produced
+
+
+def _variant_urls(digest: str) -> Dict:
+    return {
+        "webp_url": f"{URL_PREFIX}/{digest}.webp",
+        "thumbnails": {
+            str(size): {
+                "jpeg": f"{URL_PREFIX}/{digest}_{size}.jpg",
+                "webp": f"{URL_PREFIX}/{digest}_{size}.webp",
+            }
+            for size in settings.THUMBNAIL_SIZES
+        },
+    }
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Image exceeds {settings.MAX_UPLOAD_BYTES} bytes",
+    )
+
+
+class _ImageSink:
+    """Takes the image's bytes as they are parsed: checks type and size, hashes, writes."""
+
+    def __init__(self, out):
+        self.out = out
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.head = b""  # Held back until there are enough bytes to sniff
+        self.content_type = None
+
+    def _sniff(self) -> None:
+        self.content_type = _sniff_type(self.head)
+        if self.content_type is None or self.content_type not in ALLOWED_TYPES:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Only JPEG, PNG, GIF and WebP images are accepted",
+            )
+
+    async def _write(self, data: bytes) -> None:
+        self.hasher.update(data)
+        await run_in_threadpool(self.out.write, data)
+
+    async def write(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > settings.MAX_UPLOAD_BYTES:
+            raise _too_large()
+        if self.content_type is None:
+            self.head += data
+            if len(self.head) < SNIFF_BYTES:
+                return
+            self._sniff()
+            data, self.head = self.head, b""
+        await self._write(data)
+
+    async def close(self) -> None:
+        if self.content_type is None:
+            if not self.head:
+                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Empty upload")
+            self._sniff()
+            await self._write(self.head)
+
+
+class _FilePart:
+    """python-multipart callbacks that pick out the UPLOAD_FIELD part's bytes."""
+
+    def __init__(self):
+        self.found = False
+        self.data: List[bytes] = []  # Parsed since the last drain
+        self._in_file = False
+        self._header_field = b""
+        self._header_value = b""
+        self._disposition = b""
+
+    def callbacks(self) -> dict:
+        return {
+            "on_part_begin": self._part_begin,
+            "on_header_field": self._header_field_data,
+            "on_header_value": self._header_value_data,
+            "on_header_end": self._header_end,
+            "on_headers_finished": self._headers_finished,
+            "on_part_data": self._part_data,
+            "on_part_end": self._part_end,
+        }
+
+    def _part_begin(self) -> None:
+        self._disposition = b""
+
+    def _header_field_data(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _header_value_data(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _header_end(self) -> None:
+        if self._header_field.lower() == b"content-disposition":
+            self._disposition = self._header_value
+        self._header_field = self._header_value = b""
+
+    def _headers_finished(self) -> None:
+        _, options = parse_options_header(self._disposition)
+        # Only the first file part is kept; other form fields are ignored
+        self._in_file = not self.found and options.get(b"name") == UPLOAD_FIELD.encode()
+        self.found = self.found or self._in_file
+
+    def _part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_file:
+            self.data.append(data[start:end])
+
+    def _part_end(self) -> None:
+        self._in_file = False
+
+    def drain(self) -> List[bytes]:
+        data, self.data = self.data, []
+        return data
+
+
+async def _stream_to_temp(request: Request, directory: str) -> tuple[str, str, str]:
+    """Parse the multipart body as it arrives, writing the image part to a temp file.
+
+    Returns (path, digest, content type). Nothing is buffered beyond one
+    chunk, and the body is cut off as soon as it passes the size cap.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail="Expected a multipart/form-data upload"
+        )
+    body_limit = settings.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD
+
+    part = _FilePart()
+    parser = multipart.MultipartParser(boundary, callbacks=part.callbacks())
+    received = 0
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            sink = _ImageSink(out)
+            async for chunk in request.stream():
+                received += len(chunk)
+                if received > body_limit:
+                    raise _too_large()
+                parser.write(chunk)
+                for data in part.drain():
+                    await sink.write(data)
+            parser.finalize()
+            for data in part.drain():
+                await sink.write(data)
+            if not part.found:
+                raise HTTPException(
+                    status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=f"Missing '{UPLOAD_FIELD}' file field"
+                )
+            await sink.close()
+    except multipart.exceptions.MultipartParseError:
+        os.unlink(temp_path)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Malformed multipart body")
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return temp_path, sink.hasher.hexdigest(), sink.content_type
+
+
+async def store_image(request: Request) -> Dict:
+    """Store the image uploaded in the request's `file` field.
+
+    The type is taken from the file's magic bytes, not the client's header.
+    """
+    # Reject oversized uploads before reading anything when the size is declared
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > settings.MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD:
+        raise _too_large()
+
+    directory = settings.UPLOAD_DIR
+    os.makedirs(directory, exist_ok=True)
+    temp_path, digest, content_type = await _stream_to_temp(request, directory)
+
+    name = f"{digest}{ALLOWED_TYPES[content_type]}"
+    final_path = os.path.join(directory, name)
+    is_new = not os.path.exists(final_path)
+    if is_new:
+        os.replace(temp_path, final_path)
+    else:
+        os.unlink(temp_path)  # Already stored under this digest
+
+    loop = asyncio.get_running_loop()
+    try:
+        await loop.run_in_executor(
+            _get_executor(), _make_variants, final_path, digest, directory, list(settings.THUMBNAIL_SIZES)
+        )
+    except Exception:
+        if is_new:
+            os.unlink(final_path)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Could not decode image")
+
+    return {"image_url": f"{URL_PREFIX}/{name}", **_variant_urls(digest)}
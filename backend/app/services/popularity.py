@@ -0,0 +1,139 @@
+# File: backend/app/services/popularity.py
+#
+# Product view counts and the "trending" order. Detail views are counted in
+# memory and flushed every VIEW_FLUSH_SECONDS as one bulk_write to
+# `product_stats`, so a page view costs no write of its own; the lifespan
+# flushes once more on shutdown.
+#
+# Popularity decays exponentially with a half-life of TRENDING_HALF_LIFE_HOURS.
+# Rather than decaying every product on a timer, each view is weighted by
+# 2^(t / half-life) from a fixed epoch, which ranks products exactly as the
+# decayed totals would at any moment. The running sum is kept as its
+# logarithm (log-add-exp in the update pipeline) so it never overflows.
+
+import asyncio
+import logging
+import math
+from collections import Counter
+from datetime import datetime
+from typing import List
+from pymongo import DESCENDING, IndexModel, UpdateOne
+from pymongo.errors import PyMongoError
+from app.core.config import settings
+from app.core.database import db
+from app.core.metrics import register_stats
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(2024, 1, 1)
+SCORE_FIELD = "log_score"
+
+# Registered in app.core.indexes
+TRENDING_INDEX = IndexModel([(SCORE_FIELD, DESCENDING)], name="product_stats_trending")
+
+
+def _log_weight(when: datetime) -> float:
+    half_lives = (when - EPOCH).total_seconds() / (settings.TRENDING_HALF_LIFE_HOURS * 3600)
+    return half_lives * math.log(2)
+
+
+def _view_update(views: int, now: datetime) -> list:
+    # log_score = ln(e^log_score + views * 2^(t / half-life)), computed as
+    # max + ln(1 + e^(min - max)); a new document starts from ln(0) = -inf
+    added = math.log(views) + _log_weight(now)
+    current = {"$ifNull": [f"${SCORE_FIELD}", float("-inf")]}
+    high = {"$max": [current, added]}
+    low = {"$min": [current, added]}
+    return [{"$set": {
+        "views": {"$add": [{"$ifNull": ["$views", 0]}, views]},
+        SCORE_FIELD: {"$add": [high, {"$ln": {"$add": [1, {"$exp": {"$subtract": [low, high]}}]}}]},
+        "last_viewed_at": now,
+    }}]
+
+
+class ViewBuffer:
+    def __init__(self):
+        self._pending: Counter = Counter()
+        # Products deleted since the current flush took its batch
+        self._discarded: set = set()
+        self.flushes = 0
+        self.failures = 0
+
+    def record(self, product_id: str) -> None:
+        self._pending[product_id] += 1
+
+    def discard(self, product_id: str) -> None:
+        """Drop a deleted product's buffered views so no flush recreates its stats."""
+        self._pending.pop(product_id, None)
+        self._discarded.add(product_id)
+
+    async def flush(self) -> int:
+        """Write buffered views; on failure they are kept for the next flush."""
+        pending, self._pending = self._pending, Counter()
+        self._discarded = set()
+        if not pending:
+            return 0
+        now = datetime.utcnow()
+        ops = [
+            UpdateOne({"_id": product_id}, _view_update(views, now), upsert=True)
+            for product_id, views in pending.items()
+        ]
+        try:
+            await db.product_stats.bulk_write(ops, ordered=False)
+        except (PyMongoError, asyncio.CancelledError):
+            # Cancelled by shutdown mid-write: the final flush retries these
+            self.failures += 1
+            self._pending.update({pid: n for pid, n in pending.items() if pid not in self._discarded})
+            raise
+        # A product deleted while this batch was being written may have had
+        # its stats upserted again just after forget_product removed them
+        recreated = [pid for pid in pending if pid in self._discarded]
+        if recreated:
+            await db.product_stats.delete_many({"_id": {"$in": recreated}})
+        self.flushes += 1
+        return len(ops)
+
+    def stats(self) -> dict:
+        return {
+            "pending_products": len(self._pending),
+            "pending_views": sum(self._pending.values()),
+            "flushes": self.flushes,
+            "failures": self.failures,
+        }
+
+
+views = ViewBuffer()
+register_stats("view_buffer", "Buffered product views", views.stats)
+
+
+async def run_flusher(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await views.flush()
+        except Exception:
+            logger.exception("Flushing product views failed")
+
+
+async def forget_product(product_id: str) -> None:
+    views.discard(product_id)
+    await db.product_stats.delete_one({"_id": product_id})
+
+
+async def trending(limit: int, skip: int = 0) -> List[dict]:
+    """The most popular products as [{product_id, views, score}], score being decayed views."""
+    now_weight = _log_weight(datetime.utcnow())
+    cursor = (
+        db.product_stats.find({}, {"views": 1, SCORE_FIELD: 1})
+        .sort(SCORE_FIELD, DESCENDING)
+        .skip(skip)
+        .limit(limit)
+    )
+    return [
+        {
+            "product_id": doc["_id"],
+            "views": doc.get("views", 0),
+            "score": round(math.exp(doc[SCORE_FIELD] - now_weight), 4),
+        }
+        async for doc in cursor
+    ]
@@ -0,0 +1,64 @@
+# File: backend/app/services/product_cache.py
+#
+# Response cache for the public product read routes. Detail responses are
+# tagged with their product id; listings are tagged with the category they
+# filter on, or "category:*" when unfiltered, since any product can appear there.
+
+from typing import Optional
+from app.core import change_feed
+from app.core.config import settings
+from app.core.metrics import register_stats
+from app.core.response_cache import ResponseCache
+
+product_responses = ResponseCache(
+    maxsize=settings.PRODUCT_CACHE_MAX_ENTRIES,
+    ttl=settings.PRODUCT_CACHE_TTL_SECONDS,
+)
+register_stats("product_response_cache", "Product read response cache", product_responses.stats)
+
+CACHE_CONTROL = f"public, max-age={settings.PRODUCT_CACHE_MAX_AGE}, must-revalidate"
+
+
+def product_tag(product_id: str) -> str:
+    return f"product:{product_id}"
+
+
+LISTING_TAG_PREFIX = "category:"
+
+
+def listing_tag(category: Optional[str]) -> str:
+    return f"{LISTING_TAG_PREFIX}{category or '*'}"
+
+
+def invalidate_product(product_id: str, *categories: Optional[str]) -> None:
+    """Drop cached responses that may include this product.
+
+    Pass every category the product had before and after the write.
+    """
+    tags = {product_tag(product_id), listing_tag(None)}
+    tags.update(listing_tag(category) for category in categories if category)
+    product_responses.invalidate_tags(*tags)
+    change_feed.touch("products")
+
+
+def invalidate_listings(*categories: Optional[str]) -> None:
+    # For bulk writes where per-product tags don't matter (new products have no cached detail)
+    tags = {listing_tag(None)}
+    tags.update(listing_tag(category) for category in categories if category)
+    product_responses.invalidate_tags(*tags)
+    change_feed.touch("products")
+
+
+def _on_product_change(event: change_feed.ChangeEvent) -> None:
+    # Writes from other workers. The previous category isn't in the event, so
+    # when it may have changed every category listing goes.
+    if event.operation == "reset":
+        product_responses.clear()
+        return
+    category = (event.document or {}).get("category")
+    product_responses.invalidate_tags(product_tag(str(event.document_id)), listing_tag(None), listing_tag(category))
+    if event.operation != "insert" and (event.updated_fields is None or "category" in event.updated_fields):
+        product_responses.invalidate_tag_prefix(LISTING_TAG_PREFIX)
+
+
+change_feed.subscribe("products", _on_product_change, fields=["category"])
@@ -0,0 +1,120 @@
+# File: backend/app/services/search.py
+#
+# Product search backed by an inverted index stored on each product document.
+# Every product carries a `search_terms` array of {"t": term, "w": weight}
+# entries covering its title, category and description (whole tokens plus
+# their prefixes). A multikey index on `search_terms.t` turns a query into an
+# index lookup, so cost grows with the number of matches rather than with the
+# size of the catalog. Because the postings live on the product itself they
+# are written, replaced and removed together with it.
+
+import asyncio
+import re
+import unicodedata
+from typing import Dict, List
+from pymongo import IndexModel, UpdateOne
+from app.core.database import db
+
+SEARCH_FIELD = "search_terms"
+
+# Relative importance of each indexed field when ranking results
+FIELD_WEIGHTS = {"title": 3.0, "category": 2.0, "description": 1.0}
+PREFIX_WEIGHT = 0.5  # A prefix hit counts for less than a whole-word hit
+
+MIN_TERM_LENGTH = 2
+MAX_TERM_LENGTH = 32
+MAX_PREFIX_LENGTH = 12
+
+STOP_WORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in",
+    "is", "it", "of", "on", "or", "the", "to", "with",
+}
+
+_TOKEN_RE = re.compile(r"\w+")
+
+
+def _fold(text: str) -> str:
+    # Lowercase and strip accents so "Café" and "cafe" index the same
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def tokenize(text: str | None) -> List[str]:
+    if not text:
+        return []
+    tokens = []
+    for token in _TOKEN_RE.findall(_fold(text)):
+        if len(token) < MIN_TERM_LENGTH or token in STOP_WORDS:
+            continue
+        tokens.append(token[:MAX_TERM_LENGTH])
+    return tokens
+
+
+def query_terms(text: str | None) -> List[str]:
+    return list(dict.fromkeys(tokenize(text)))
+
+
+def build_search_terms(doc: dict) -> List[dict]:
+    weights: Dict[str, float] = {}
+    for field, field_weight in FIELD_WEIGHTS.items():
+        for token in tokenize(doc.get(field)):
+            weights[token] = weights.get(token, 0.0) + field_weight
+            for end in range(MIN_TERM_LENGTH, min(len(token), MAX_PREFIX_LENGTH + 1)):
+                prefix = token[:end]
+                weights[prefix] = weights.get(prefix, 0.0) + field_weight * PREFIX_WEIGHT
+    return [{"t": term, "w": weight} for term, weight in weights.items()]
+
+
+def match_filter(terms: List[str]) -> dict:
+    # Every query term must hit, either as a word or as a word prefix
+    return {f"{SEARCH_FIELD}.t": {"$all": terms}}
+
+
+def score_expression(terms: List[str]) -> dict:
+    return {
+        "$sum": {
+            "$map": {
+                "input": {
+                    "$filter": {
+                        "input": f"${SEARCH_FIELD}",
+                        "cond": {"$in": ["$$this.t", terms]},
+                    }
+                },
+                "in": "$$this.w",
+            }
+        }
+    }
+
+
+# Registered in app.core.indexes
+SEARCH_INDEX = IndexModel([(f"{SEARCH_FIELD}.t", 1)], name="product_search_terms")
+
+
+async def ensure_search_index():
+    await db.products.create_indexes([SEARCH_INDEX])
+
+
+async def reindex_products(batch_size: int = 500) -> int:
+    """Rebuild `search_terms` for every product, e.g. after changing weights."""
+    await ensure_search_index()
+    projection = {field: 1 for field in FIELD_WEIGHTS}
+    updated = 0
+    batch = []
+    async for doc in db.products.find({}, projection):
+        batch.append(UpdateOne(
+            {"_id": doc["_id"]},
+            {"$set": {SEARCH_FIELD: build_search_terms(doc)}},
+        ))
+        if len(batch) >= batch_size:
+            await db.products.bulk_write(batch, ordered=False)
+            updated += len(batch)
+            batch = []
+    if batch:
+        await db.products.bulk_write(batch, ordered=False)
+        updated += len(batch)
+    return updated
+
+
+if __name__ == "__main__":
+    count = asyncio.run(reindex_products())
+    print(f"Reindexed {count} products")
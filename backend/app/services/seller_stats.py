@@ -0,0 +1,177 @@
+# File: backend/app/services/seller_stats.py
+#
+# Sales rollups for sellers. Checkout $incs one document per (seller, UTC day)
+# holding revenue, units, purchase count and per-product totals, so a
+# dashboard reads at most 30 small documents however many purchases exist.
+# `python -m app.services.seller_stats` rebuilds the rollups from history
+# while checkouts keep running.
+
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from bson.objectid import ObjectId
+from pymongo import DeleteOne, ReplaceOne, UpdateOne
+from pymongo.errors import BulkWriteError
+from app.core.database import db
+
+WINDOWS = {"day": 1, "week": 7, "month": 30}
+TOP_PRODUCTS = 5
+BACKFILL_BATCH_SIZE = 1000
+DUPLICATE_KEY = 11000
+
+
+def _day(moment: datetime) -> datetime:
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def _new_totals() -> Dict[tuple, Dict[str, float]]:
+    return defaultdict(lambda: defaultdict(int))
+
+
+def _fold(purchases: Iterable[dict], owners: Dict[str, str], totals: Dict[tuple, Dict[str, float]]) -> None:
+    for purchase in purchases:
+        seller_id = owners.get(purchase["product_id"])
+        if not seller_id:
+            continue
+        units = purchase.get("quantity", 1)
+        revenue = (purchase.get("price") or 0) * units
+        inc = totals[(seller_id, _day(purchase["purchased_at"]))]
+        inc["revenue"] += revenue
+        inc["units"] += units
+        inc["purchases"] += 1
+        inc[f"products.{purchase['product_id']}.units"] += units
+        inc[f"products.{purchase['product_id']}.revenue"] += revenue
+
+
+def _rollup_ops(purchases: Iterable[dict], owners: Dict[str, str]) -> List[UpdateOne]:
+    # Fold purchases into one $inc per seller-day before touching Mongo; the
+    # version lets backfill() see a rollup change under it
+    totals = _new_totals()
+    _fold(purchases, owners, totals)
+    return [
+        UpdateOne({"seller_id": seller_id, "day": day}, {"$inc": {**inc, "version": 1}}, upsert=True)
+        for (seller_id, day), inc in totals.items()
+    ]
+
+
+def _rollup_doc(seller_id: str, day: datetime, inc: Dict[str, float], **extra) -> dict:
+    # The document the $inc paths of _fold build up
+    doc = {"seller_id": seller_id, "day": day, "revenue": 0, "units": 0, "purchases": 0, "products": {}, **extra}
+    for path, value in inc.items():
+        if path.startswith("products."):
+            _, product_id, field = path.split(".")
+            doc["products"].setdefault(product_id, {})[field] = value
+        else:
+            doc[path] = value
+    return doc
+
+
+async def record_purchases(purchases: List[dict], owners: Dict[str, str], session=None) -> None:
+    """Add purchases to their sellers' rollups; `owners` maps product_id to owner_id."""
+    ops = _rollup_ops(purchases, owners)
+    if ops:
+        await db.seller_rollups.bulk_write(ops, ordered=False, session=session)
+
+
+async def get_stats(seller_id: str, window: str, now: Optional[datetime] = None) -> dict:
+    since = _day(now or datetime.utcnow()) - timedelta(days=WINDOWS[window] - 1)
+    revenue = units = purchases = 0
+    products: Dict[str, Dict[str, float]] = defaultdict(lambda: {"units": 0, "revenue": 0.0})
+    async for rollup in db.seller_rollups.find({"seller_id": seller_id, "day": {"$gte": since}}):
+        revenue += rollup.get("revenue", 0)
+        units += rollup.get("units", 0)
+        purchases += rollup.get("purchases", 0)
+        for product_id, totals in rollup.get("products", {}).items():
+            products[product_id]["units"] += totals.get("units", 0)
+            products[product_id]["revenue"] += totals.get("revenue", 0)
+
+    top = sorted(products.items(), key=lambda item: (-item[1]["revenue"], -item[1]["units"]))[:TOP_PRODUCTS]
+    titles = {}
+    if top:
+        ids = [ObjectId(pid) for pid, _ in top if ObjectId.is_valid(pid)]
+        async for doc in db.products.find({"_id": {"$in": ids}}, {"title": 1}):
+            titles[str(doc["_id"])] = doc.get("title")
+
+    return {
+        "window": window,
+        "since": since,
+        "revenue": round(revenue, 2),
+        "units": units,
+        "purchases": purchases,
+        "top_products": [
+            {
+                "product_id": pid,
+                "title": titles.get(pid),
+                "units": totals["units"],
+                "revenue": round(totals["revenue"], 2),
+            }
+            for pid, totals in top
+        ],
+    }
+
+
+async def _write_rollups(ops: list) -> None:
+    try:
+        await db.seller_rollups.bulk_write(ops, ordered=False)
+    except BulkWriteError as exc:
+        # A guarded upsert whose rollup was created meanwhile; left as it is
+        if any(error["code"] != DUPLICATE_KEY for error in exc.details["writeErrors"]):
+            raise
+
+
+async def backfill(batch_size: int = BACKFILL_BATCH_SIZE) -> int:
+    """Rebuild every rollup from the purchases collection, in batches.
+
+    Rollups stay readable throughout: each one is replaced by its rebuilt
+    version rather than wiped first. Days before today no longer change, so
+    theirs are replaced outright and those no purchase backs are deleted.
+    Rollups from today on still take checkouts, so one is only replaced if
+    its version is the one read before the scan; one that changed meanwhile
+    keeps its live totals.
+    """
+    started = datetime.utcnow()
+    today = _day(started)
+    live_versions = {
+        (doc["seller_id"], doc["day"]): doc.get("version")
+        async for doc in db.seller_rollups.find({"day": {"$gte": today}}, {"seller_id": 1, "day": 1, "version": 1})
+    }
+
+    totals = _new_totals()
+    owners: Dict[str, str] = {}
+    processed = 0
+    last_id = None
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id else {}
+        batch = await db.purchases.find(query).sort("_id", 1).limit(batch_size).to_list(length=batch_size)
+        if not batch:
+            break
+        missing = {p["product_id"] for p in batch if p["product_id"] not in owners}
+        ids = [ObjectId(pid) for pid in missing if ObjectId.is_valid(pid)]
+        async for doc in db.products.find({"_id": {"$in": ids}}, {"owner_id": 1}):
+            owners[str(doc["_id"])] = doc.get("owner_id")
+        _fold(batch, owners, totals)
+        processed += len(batch)
+        last_id = batch[-1]["_id"]
+
+    ops = []
+    for (seller_id, day), inc in totals.items():
+        key = {"seller_id": seller_id, "day": day}
+        if day < today:
+            ops.append(ReplaceOne(key, _rollup_doc(seller_id, day, inc, rebuilt_at=started), upsert=True))
+        else:
+            # None also matches a rollup without a version, or none at all
+            version = live_versions.pop((seller_id, day), None)
+            replacement = _rollup_doc(seller_id, day, inc, rebuilt_at=started, version=(version or 0) + 1)
+            ops.append(ReplaceOne({**key, "version": version}, replacement, upsert=True))
+    for (seller_id, day), version in live_versions.items():
+        ops.append(DeleteOne({"seller_id": seller_id, "day": day, "version": version}))
+    for offset in range(0, len(ops), batch_size):
+        await _write_rollups(ops[offset:offset + batch_size])
+    await db.seller_rollups.delete_many({"day": {"$lt": today}, "rebuilt_at": {"$ne": started}})
+    return processed
+
+
+if __name__ == "__main__":
+    count = asyncio.run(backfill())
+    print(f"Rebuilt seller rollups from {count} purchases")
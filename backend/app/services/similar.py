@@ -0,0 +1,290 @@
+# File: backend/app/services/similar.py
+#
+# "Similar products" precomputed offline. rebuild() turns every product's
+# title, category and description into an L2-normalised TF-IDF vector (the
+# same tokens and field weights search uses), multiplies the sparse matrix
+# against itself a block of rows at a time so memory stays bounded, and
+# stores each product's top-k neighbours in `similar_products`, keyed by
+# product id. Serving a product's neighbours is then one _id lookup.
+#
+# The vocabulary, IDF weights and matrix are saved to SIMILAR_MODEL_PATH.
+# A created or edited product is scored against that saved matrix only
+# (update_product; update_products for a bulk import's batch), and is also offered to its neighbours' lists, so it shows
+# up without a rebuild; the periodic rebuild picks up vocabulary changes and
+# drops deleted products.
+#
+#   python -m app.services.similar
+#
+# NumPy and SciPy are only needed by the job and the incremental update, not
+# by the endpoint that reads the results.
+
+import asyncio
+import math
+import os
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from bson.objectid import ObjectId
+from pymongo import ReplaceOne, UpdateOne
+from app.core import jobs
+from app.core.config import settings
+from app.core.database import db
+from app.services.search import FIELD_WEIGHTS, tokenize
+
+TOP_K = 10
+MIN_SCORE = 0.05  # Below this two products share little more than a stop word
+BLOCK_CELLS = 16_000_000  # Dense similarity scores held at once (~64 MB of float32)
+WRITE_BATCH_SIZE = 500
+TEXT_FIELDS = {field: 1 for field in FIELD_WEIGHTS}
+
+
+def term_weights(doc: dict) -> Counter:
+    weights = Counter()
+    for field, field_weight in FIELD_WEIGHTS.items():
+        for token in tokenize(doc.get(field)):
+            weights[token] += field_weight
+    return weights
+
+
+class SimilarityModel:
+    """Vocabulary, IDF weights and the normalised product-term matrix."""
+
+    def __init__(self, ids, vocabulary: Dict[str, int], idf, matrix):
+        self.ids = ids  # Row -> product id (str)
+        self.rows = {product_id: row for row, product_id in enumerate(ids)}
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.matrix = matrix  # scipy.sparse CSR, one unit-length row per product
+
+    @classmethod
+    def fit(cls, docs: List[Tuple[str, Counter]]) -> "SimilarityModel":
+        import numpy as np
+        from scipy import sparse
+
+        vocabulary: Dict[str, int] = {}
+        document_frequency = Counter()
+        for _, weights in docs:
+            document_frequency.update(weights.keys())
+            for term in weights:
+                vocabulary.setdefault(term, len(vocabulary))
+        total = len(docs)
+        idf = np.zeros(len(vocabulary), dtype=np.float32)
+        for term, column in vocabulary.items():
+            idf[column] = math.log((1 + total) / (1 + document_frequency[term])) + 1
+
+        indptr, indices, data = [0], [], []
+        for _, weights in docs:
+            for term, weight in weights.items():
+                indices.append(vocabulary[term])
+                data.append(weight)
+            indptr.append(len(indices))
+        matrix = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr)),
+            shape=(total, len(vocabulary)),
+        )
+        matrix = _normalise(matrix.multiply(idf).tocsr())
+        return cls(np.array([product_id for product_id, _ in docs]), vocabulary, idf, matrix)
+
+    def vectorize(self, weights: Counter):
+        """A unit vector for one product, using only terms the model already knows."""
+        import numpy as np
+        from scipy import sparse
+
+        columns = [(self.vocabulary[term], weight) for term, weight in weights.items() if term in self.vocabulary]
+        data = np.array([weight * self.idf[column] for column, weight in columns], dtype=np.float32)
+        indices = np.array([column for column, _ in columns], dtype=np.int32)
+        vector = sparse.csr_matrix((data, indices, [0, len(columns)]), shape=(1, len(self.vocabulary)))
+        return _normalise(vector)
+
+    def neighbours(self, block, exclude_rows, k: int) -> List[List[Tuple[str, float]]]:
+        """Top-k (product id, score) per row of `block`, skipping each row's excluded column."""
+        import numpy as np
+
+        scores = (block @ self.matrix.T).toarray()
+        rows = np.arange(scores.shape[0])
+        valid = exclude_rows >= 0
+        scores[rows[valid], exclude_rows[valid]] = -1.0
+        k = min(k, scores.shape[1])
+        if k == 0:
+            return [[] for _ in rows]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row in rows:
+            columns = top[row][np.argsort(-scores[row, top[row]])]
+            results.append([
+                (str(self.ids[column]), round(float(scores[row, column]), 4))
+                for column in columns
+                if scores[row, column] >= MIN_SCORE
+            ])
+        return results
+
+    def save(self, path: str) -> None:
+        import numpy as np
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        temporary = path + ".tmp.npz"
+        np.savez_compressed(
+            temporary,
+            ids=self.ids,
+            terms=np.array(terms),
+            idf=self.idf,
+            data=self.matrix.data,
+            indices=self.matrix.indices,
+            indptr=self.matrix.indptr,
+            shape=np.array(self.matrix.shape),
+        )
+        os.replace(temporary, path)  # Readers never see a half-written model
+
+    @classmethod
+    def load(cls, path: str) -> "SimilarityModel":
+        import numpy as np
+        from scipy import sparse
+
+        with np.load(path) as saved:
+            matrix = sparse.csr_matrix(
+                (saved["data"], saved["indices"], saved["indptr"]), shape=tuple(saved["shape"])
+            )
+            vocabulary = {str(term): column for column, term in enumerate(saved["terms"])}
+            return cls(saved["ids"], vocabulary, saved["idf"], matrix)
+
+
+def _normalise(matrix):
+    import numpy as np
+    from scipy import sparse
+
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms).dot(matrix).tocsr().astype(np.float32)
+
+
+# Loaded on first use and reloaded when a rebuild replaces the file
+_model: Optional[SimilarityModel] = None
+_model_mtime: Optional[float] = None
+
+
+def _current_model() -> Optional[SimilarityModel]:
+    global _model, _model_mtime
+    try:
+        mtime = os.path.getmtime(settings.SIMILAR_MODEL_PATH)
+    except OSError:
+        return None  # Nothing built yet
+    if _model is None or mtime != _model_mtime:
+        _model = SimilarityModel.load(settings.SIMILAR_MODEL_PATH)
+        _model_mtime = mtime
+    return _model
+
+
+def _neighbour_doc(product_id: str, neighbours: List[Tuple[str, float]], now: datetime) -> dict:
+    return {
+        "_id": product_id,
+        "neighbours": [{"product_id": other, "score": score} for other, score in neighbours],
+        "computed_at": now,
+    }
+
+
+async def rebuild(k: int = TOP_K) -> int:
+    import numpy as np
+
+    docs = [
+        (str(doc["_id"]), term_weights(doc))
+        async for doc in db.products.find({}, TEXT_FIELDS).batch_size(WRITE_BATCH_SIZE)
+    ]
+    if not docs:
+        await db.similar_products.delete_many({})
+        return 0
+    model = SimilarityModel.fit(docs)
+
+    # Size blocks so one block of dense scores stays within BLOCK_CELLS
+    total = model.matrix.shape[0]
+    block_rows = max(1, BLOCK_CELLS // total)
+    now = datetime.utcnow()
+    for start in range(0, total, block_rows):
+        end = min(start + block_rows, total)
+        # Off the event loop: a block is a large sparse product
+        results = await asyncio.to_thread(model.neighbours, model.matrix[start:end], np.arange(start, end), k)
+        ops = []
+        for row, neighbours in zip(range(start, end), results):
+            product_id = str(model.ids[row])
+            ops.append(ReplaceOne({"_id": product_id}, _neighbour_doc(product_id, neighbours, now), upsert=True))
+        for offset in range(0, len(ops), WRITE_BATCH_SIZE):
+            await db.similar_products.bulk_write(ops[offset:offset + WRITE_BATCH_SIZE], ordered=False)
+
+    # Anything not rewritten belongs to a deleted product
+    await db.similar_products.delete_many({"computed_at": {"$lt": now}})
+    model.save(settings.SIMILAR_MODEL_PATH)
+    return total
+
+
+@jobs.job("similar.update_product")
+async def update_product(product_id: str, k: int = TOP_K) -> None:
+    """Score one created or edited product against the saved matrix."""
+    await update_products([product_id], k)
+
+
+@jobs.job("similar.update_products")
+async def update_products(product_ids: List[str], k: int = TOP_K) -> None:
+    """Score created or edited products against the saved matrix, a block at a time.
+
+    Products scored together aren't in the matrix yet, so they don't become
+    each other's neighbours until the next rebuild.
+    """
+    model = await asyncio.to_thread(_current_model)
+    if model is None:
+        return
+    ids = [ObjectId(pid) for pid in product_ids if ObjectId.is_valid(pid)]
+    docs = [doc async for doc in db.products.find({"_id": {"$in": ids}}, TEXT_FIELDS)]
+    if not docs:
+        return
+    import numpy as np
+    from scipy import sparse
+
+    block_rows = max(1, BLOCK_CELLS // max(1, model.matrix.shape[0]))
+    for start in range(0, len(docs), block_rows):
+        chunk = docs[start:start + block_rows]
+        chunk_ids = [str(doc["_id"]) for doc in chunk]
+        block = sparse.vstack([model.vectorize(term_weights(doc)) for doc in chunk]).tocsr()
+        # An edited product is still in the matrix under its old text
+        exclude = np.array([model.rows.get(product_id, -1) for product_id in chunk_ids])
+        results = await asyncio.to_thread(model.neighbours, block, exclude, k)
+        now = datetime.utcnow()
+        ops = []
+        for product_id, neighbours in zip(chunk_ids, results):
+            ops.append(ReplaceOne({"_id": product_id}, _neighbour_doc(product_id, neighbours, now), upsert=True))
+            # Offer the product to each neighbour's list; $sort + $slice keeps the best k
+            for other, score in neighbours:
+                ops.append(UpdateOne({"_id": other}, {"$pull": {"neighbours": {"product_id": product_id}}}))
+                ops.append(UpdateOne({"_id": other}, {"$push": {"neighbours": {
+                    "$each": [{"product_id": product_id, "score": score}],
+                    "$sort": {"score": -1},
+                    "$slice": k,
+                }}}))
+        for offset in range(0, len(ops), WRITE_BATCH_SIZE):
+            # Ordered: each $pull must land before its $push
+            await db.similar_products.bulk_write(ops[offset:offset + WRITE_BATCH_SIZE], ordered=True)
+
+
+async def schedule_update(product_id: str) -> None:
+    await jobs.enqueue("similar.update_product", product_id=product_id)
+
+
+async def schedule_updates(product_ids: List[str]) -> None:
+    if product_ids:
+        await jobs.enqueue("similar.update_products", product_ids=product_ids)
+
+
+async def forget_product(product_id: str) -> None:
+    # Other lists still name it until the next rebuild; readers skip unknown ids
+    await db.similar_products.delete_one({"_id": product_id})
+
+
+async def get_similar(product_id: str, limit: int = TOP_K) -> List[dict]:
+    doc = await db.similar_products.find_one({"_id": product_id}, {"neighbours": {"$slice": limit}})
+    return doc["neighbours"] if doc else []
+
+
+if __name__ == "__main__":
+    count = asyncio.run(rebuild())
+    print(f"Computed similar products for {count} products")
@@ -0,0 +1,471 @@
+# File: backend/benchmarks/run.py
+#
+# Load test for every router. Boots app.main:app in-process against a
+# throwaway Mongo, seeds a catalog, drives each route with concurrent clients
+# and reports p50/p95/p99 latency and throughput per route.
+#
+#   cd backend
+#   python -m benchmarks.run --products 20000 --concurrency 32 --output bench.json
+#   python -m benchmarks.run --baseline bench.json   # exits 1 on regression
+#
+# --mongo picks the database: a mongodb:// URL, "mongod" to start a temporary
+# single-node replica set from the mongod on PATH, or "mock" for the in-process
+# mongomock-motor (no server needed, but slower and missing some operators, so
+# routes it cannot serve are reported as errors). "auto" tries mongod, then mock.
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+CATEGORIES = ["electronics", "furniture", "clothing", "books", "sports", "home", "toys", "garden"]
+WORDS = [
+    "vintage", "leather", "wooden", "camera", "lens", "jacket", "table", "chair", "lamp", "phone",
+    "bicycle", "guitar", "sneakers", "dress", "novel", "kettle", "desk", "mirror", "speaker", "watch",
+]
+BENCH_PASSWORD = "benchmark-password"
+
+
+# --- Mongo stand-ins -------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class ThrowawayMongod:
+    """A temporary single-node replica set, so transactions are available too."""
+
+    def __init__(self):
+        self.dbpath = tempfile.mkdtemp(prefix="ecofinds-bench-")
+        self.port = _free_port()
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"mongodb://127.0.0.1:{self.port}/?directConnection=true"
+
+    def start(self) -> str:
+        from pymongo import MongoClient
+
+        self.process = subprocess.Popen(
+            ["mongod", "--dbpath", self.dbpath, "--port", str(self.port), "--bind_ip", "127.0.0.1",
+             "--replSet", "bench", "--quiet"],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        admin = MongoClient(self.url, serverSelectionTimeoutMS=20000)
+        admin.admin.command("replSetInitiate", {"_id": "bench", "members": [{"_id": 0, "host": f"127.0.0.1:{self.port}"}]})
+        deadline = time.monotonic() + 30
+        while not admin.admin.command("hello").get("isWritablePrimary"):
+            if time.monotonic() > deadline:
+                raise RuntimeError("mongod did not become primary")
+            time.sleep(0.2)
+        admin.close()
+        return self.url
+
+    def stop(self):
+        if self.process:
+            self.process.terminate()
+            self.process.wait(timeout=30)
+        shutil.rmtree(self.dbpath, ignore_errors=True)
+
+
+def connect_database(mode: str):
+    """Point the app at the chosen Mongo; must run before app modules are imported."""
+    server = None
+    if mode == "auto":
+        mode = "mongod" if shutil.which("mongod") else "mock"
+    os.environ["DATABASE_NAME"] = "ecofinds_bench"
+    if mode == "mock":
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("--mongo mock needs the mongomock-motor package")
+        import app.core.database as database
+
+        # mongomock has no server to ping or warm
+        database.client = AsyncMongoMockClient()
+        database.db = database.client[os.environ["DATABASE_NAME"]]
+        database._transactions_supported = False
+
+        async def open_database():
+            pass
+
+        database.open_database = open_database
+        database.close_database = lambda: None
+    else:
+        if mode == "mongod":
+            server = ThrowawayMongod()
+            os.environ["DATABASE_URL"] = server.start()
+        else:
+            os.environ["DATABASE_URL"] = mode
+    return mode, server
+
+
+# --- Seeding ---------------------------------------------------------------
+
+def _title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS).capitalize() for _ in range(rng.randint(2, 4)))
+
+
+async def seed(db, rng: random.Random, users: int, products: int, purchases: int) -> Dict:
+    from app.core.security import hash_password
+    from app.services.search import SEARCH_FIELD, build_search_terms
+
+    for name in ("users", "products", "purchases", "carts", "idempotency_keys"):
+        await db[name].delete_many({})
+
+    # bcrypt once; every seeded user shares the hash
+    hashed = hash_password(BENCH_PASSWORD)
+    now = datetime.utcnow()
+    user_docs = [
+        {"email": f"user{i}@example.com", "username": f"user{i}", "hashed_password": hashed, "created_at": now}
+        for i in range(users)
+    ]
+    result = await db.users.insert_many(user_docs)
+    user_ids = [str(oid) for oid in result.inserted_ids]
+
+    product_ids: List[str] = []
+    for start in range(0, products, 1000):
+        batch = []
+        for i in range(start, min(start + 1000, products)):
+            doc = {
+                "title": _title(rng),
+                "description": " ".join(rng.choice(WORDS) for _ in range(12)),
+                "category": rng.choice(CATEGORIES),
+                "price": round(rng.uniform(1, 500), 2),
+                "image_url": None,
+                "owner_id": rng.choice(user_ids),
+                "created_at": now - timedelta(minutes=i),
+            }
+            doc[SEARCH_FIELD] = build_search_terms(doc)
+            batch.append(doc)
+        result = await db.products.insert_many(batch)
+        product_ids.extend(str(oid) for oid in result.inserted_ids)
+
+    for start in range(0, purchases, 1000):
+        batch = [
+            {
+                "user_id": rng.choice(user_ids),
+                "product_id": rng.choice(product_ids),
+                "quantity": 1,
+                "price": round(rng.uniform(1, 500), 2),
+                "purchased_at": now - timedelta(minutes=rng.randint(0, 60 * 24 * 90)),
+            }
+            for _ in range(start, min(start + 1000, purchases))
+        ]
+        await db.purchases.insert_many(batch)
+
+    return {"user_emails": [doc["email"] for doc in user_docs], "product_ids": product_ids}
+
+
+# --- Load generation -------------------------------------------------------
+
+class Bench:
+    def __init__(self, client, rng: random.Random, data: Dict, tokens: List[str]):
+        self.client = client
+        self.rng = rng
+        self.data = data
+        self.tokens = tokens
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.status_counts: Dict[int, int] = {}
+        # Kind ("HTTP 500", "KeyError", ...) -> count and the first message seen
+        self.error_samples: Dict[str, Dict] = {}
+
+    def record_error(self, kind: str, message: str) -> None:
+        self.errors += 1
+        sample = self.error_samples.setdefault(kind, {"count": 0, "sample": message[:ERROR_SAMPLE_CHARS]})
+        sample["count"] += 1
+
+    def auth(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"}
+
+    async def call(self, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        response = await self.client.request(method, url, **kwargs)
+        self.latencies.append(time.perf_counter() - started)
+        self.status_counts[response.status_code] = self.status_counts.get(response.status_code, 0) + 1
+        if response.status_code >= 400:
+            self.record_error(f"HTTP {response.status_code}", response.text)
+        return response
+
+
+async def scenario_register(bench: Bench, i: int):
+    email = f"new{i}-{bench.rng.randrange(10**9)}@example.com"
+    await bench.call("POST", "/auth/register", json={"email": email, "password": BENCH_PASSWORD})
+
+
+async def scenario_login(bench: Bench, i: int):
+    email = bench.rng.choice(bench.data["user_emails"])
+    await bench.call("POST", "/auth/login", json={"email": email, "password": BENCH_PASSWORD})
+
+
+async def scenario_product_list(bench: Bench, i: int):
+    params = {"limit": 20, "offset": bench.rng.randrange(0, 200)}
+    if bench.rng.random() < 0.5:
+        params["category"] = bench.rng.choice(CATEGORIES)
+    await bench.call("GET", "/products/", params=params)
+
+
+async def scenario_product_sorted(bench: Bench, i: int):
+    low = round(bench.rng.uniform(1, 400), 2)
+    params = {
+        "limit": 20,
+        "sort": bench.rng.choice(["newest", "price_asc", "price_desc", "title"]),
+        "min_price": low,
+        "max_price": low + 100,
+    }
+    if bench.rng.random() < 0.5:
+        params["category"] = bench.rng.choice(CATEGORIES)
+    await bench.call("GET", "/products/", params=params)
+
+
+async def scenario_product_search(bench: Bench, i: int):
+    query = bench.rng.choice(WORDS)
+    if bench.rng.random() < 0.3:
+        query = query[:3]  # Prefix search
+    await bench.call("GET", "/products/", params={"search": query, "limit": 20})
+
+
+async def scenario_product_detail(bench: Bench, i: int):
+    await bench.call("GET", f"/products/{bench.rng.choice(bench.data['product_ids'])}")
+
+
+async def scenario_cart_add(bench: Bench, i: int):
+    product_id = bench.rng.choice(bench.data["product_ids"])
+    await bench.call("POST", "/cart/", json={"product_id": product_id}, headers=bench.auth())
+
+
+async def scenario_cart_batch(bench: Bench, i: int):
+    product_ids = bench.rng.sample(bench.data["product_ids"], 5)
+    batch = {"add": [{"product_id": product_id} for product_id in product_ids]}
+    await bench.call("POST", "/cart/items", json=batch, headers=bench.auth())
+
+
+async def scenario_cart_read(bench: Bench, i: int):
+    await bench.call("GET", "/cart/", headers=bench.auth())
+
+
+async def scenario_checkout(bench: Bench, i: int):
+    headers = bench.auth()
+    # Untimed setup: give the cart something to buy
+    batch = {"add": [{"product_id": product_id} for product_id in bench.rng.sample(bench.data["product_ids"], 3)]}
+    await bench.client.post("/cart/items", json=batch, headers=headers)
+    await bench.call("POST", "/cart/checkout", headers={**headers, "Idempotency-Key": f"bench-{i}-{bench.rng.random()}"})
+
+
+async def scenario_purchase_history(bench: Bench, i: int):
+    await bench.call("GET", "/purchases/", params={"limit": 20}, headers=bench.auth())
+
+
+SCENARIOS: Dict[str, Callable[[Bench, int], Awaitable[None]]] = {
+    "POST /auth/register": scenario_register,
+    "POST /auth/login": scenario_login,
+    "GET /products/": scenario_product_list,
+    "GET /products/?sort&price": scenario_product_sorted,
+    "GET /products/?search": scenario_product_search,
+    "GET /products/{id}": scenario_product_detail,
+    "POST /cart/": scenario_cart_add,
+    "POST /cart/items": scenario_cart_batch,
+    "GET /cart/": scenario_cart_read,
+    "POST /cart/checkout": scenario_checkout,
+    "GET /purchases/": scenario_purchase_history,
+}
+
+
+# Routes relying on operators mongomock lacks; --mongo mock skips them
+# instead of reporting a wall of errors as a measurement
+MOCK_UNSUPPORTED: Dict[str, str] = {
+    "POST /cart/items": "the cart read uses $toObjectId and $lookup with a pipeline",
+    "GET /cart/": "the cart read uses $toObjectId and $lookup with a pipeline",
+    "POST /cart/checkout": "its setup fills the cart through POST /cart/items",
+    "GET /purchases/": "the history uses $lookup with let and $convert",
+}
+
+ERROR_SAMPLE_CHARS = 300
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(name: str, client, rng, data, tokens, requests: int, concurrency: int) -> Dict:
+    bench = Bench(client, rng, data, tokens)
+    scenario = SCENARIOS[name]
+    counter = iter(range(requests))
+
+    async def worker():
+        for i in counter:
+            try:
+                await scenario(bench, i)
+            except Exception as exc:
+                bench.record_error(type(exc).__name__, str(exc))
+
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    # Includes the in-process mock and client too, so compare runs on the same --mongo
+    cpu = time.process_time() - cpu_started
+
+    latencies = sorted(bench.latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)  # noqa: E731
+    return {
+        "requests": len(latencies),
+        "errors": bench.errors,
+        "status": {str(code): count for code, count in sorted(bench.status_counts.items())},
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "rps_per_core": round(len(latencies) / cpu, 1) if cpu else 0.0,
+        "mean_ms": ms(statistics.fmean(latencies)) if latencies else 0.0,
+        "p50_ms": ms(percentile(latencies, 50)),
+        "p95_ms": ms(percentile(latencies, 95)),
+        "p99_ms": ms(percentile(latencies, 99)),
+        "error_samples": bench.error_samples,
+    }
+
+
+# --- Reporting -------------------------------------------------------------
+
+def print_table(results: Dict[str, Dict]):
+    header = f"{'route':<26}{'reqs':>7}{'errs':>6}{'rps':>9}{'rps/core':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, r in results.items():
+        if "skipped" in r:
+            print(f"{name:<26}  skipped: {r['skipped']}")
+            continue
+        print(f"{name:<26}{r['requests']:>7}{r['errors']:>6}{r['throughput_rps']:>9}{r['rps_per_core']:>10}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+
+
+def print_errors(results: Dict[str, Dict]):
+    # Timings of a route that errored measure the error path; show why
+    for name, r in results.items():
+        for kind, sample in r.get("error_samples", {}).items():
+            print(f"{name}: {sample['count']} x {kind}: {sample['sample']}")
+
+
+def compare(results: Dict[str, Dict], baseline: Dict[str, Dict], threshold: float) -> List[str]:
+    regressions = []
+    for name, current in results.items():
+        before = baseline.get(name)
+        if not before or "skipped" in before or "skipped" in current:
+            continue
+        if before["p95_ms"] and current["p95_ms"] > before["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {before['p95_ms']} -> {current['p95_ms']} ms")
+        if before["throughput_rps"] and current["throughput_rps"] < before["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput {before['throughput_rps']} -> {current['throughput_rps']} rps")
+    return regressions
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def main(args) -> int:
+    os.environ["ENV"] = "benchmark"  # Skip the development-only query plan check
+    mode, server = connect_database(args.mongo)
+    try:
+        import httpx
+        import app.core.database as database
+        from app.core.security import create_access_token
+        from app.main import app
+
+        rng = random.Random(args.seed)
+        print(f"Seeding {args.users} users, {args.products} products, {args.purchases} purchases ({mode})...")
+        data = await seed(database.db, rng, args.users, args.products, args.purchases)
+        tokens = [create_access_token({"sub": email}) for email in data["user_emails"]]
+
+        selected = args.routes or list(SCENARIOS)
+        results = {}
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                for name in selected:
+                    if mode == "mock" and name in MOCK_UNSUPPORTED:
+                        results[name] = {"skipped": f"mongomock can't run it: {MOCK_UNSUPPORTED[name]}"}
+                        continue
+                    # Warm-up requests are not recorded
+                    await run_scenario(name, client, rng, data, tokens, min(args.warmup, args.requests), args.concurrency)
+                    results[name] = await run_scenario(
+                        name, client, rng, data, tokens, args.requests, args.concurrency
+                    )
+        print_table(results)
+        print_errors(results)
+
+        report = {
+            "meta": {
+                "timestamp": datetime.utcnow().isoformat(),
+                "git_revision": git_revision(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "mongo": mode,
+                "seed": args.seed,
+                "users": args.users,
+                "products": args.products,
+                "purchases": args.purchases,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+            },
+            "results": results,
+        }
+        if args.output:
+            with open(args.output, "w") as fh:
+                json.dump(report, fh, indent=2)
+            print(f"Results written to {args.output}")
+
+        if args.baseline:
+            with open(args.baseline) as fh:
+                baseline = json.load(fh)["results"]
+            regressions = compare(results, baseline, args.threshold)
+            if regressions:
+                print("Regressions against baseline:")
+                for line in regressions:
+                    print(f"  {line}")
+                return 1
+            print("No regressions against baseline")
+        return 0
+    finally:
+        if server:
+            server.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="EcoFinds API load test")
+    parser.add_argument("--mongo", default="auto", help='"auto", "mongod", "mock" or a mongodb:// URL')
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--purchases", type=int, default=10000)
+    parser.add_argument("--requests", type=int, default=500, help="Timed requests per route")
+    parser.add_argument("--warmup", type=int, default=50, help="Untimed requests per route before measuring")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for data and request mix")
+    parser.add_argument("--routes", nargs="*", choices=list(SCENARIOS), help="Only run these routes")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a previous --output file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed relative slowdown (0.10 = 10%%)")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -0,0 +1,56 @@
+import asyncio
+from typing import List
+from app.services.bulk import iter_records
+
+
+async def _stream(chunks: List[bytes]):
+    for chunk in chunks:
+        yield chunk
+
+
+def _records(chunks: List[bytes], content_type: str) -> list:
+    async def collect():
+        return [record async for record in iter_records(_stream(chunks), content_type)]
+    return asyncio.run(collect())
+
+
+def _errors(records: list) -> dict:
+    return {row: str(value) for row, value in records if isinstance(value, ValueError)}
+
+
+def test_ndjson_rows_skip_blank_lines_and_report_bad_json():
+    records = _records([b'{"title": "a"}\n\n{"tit', b'le": "b"}\nnot json\n{"title": "c"}'], "application/x-ndjson")
+    assert [row for row, _ in records] == [1, 2, 3, 4]
+    assert records[0] == (1, {"title": "a"})
+    assert records[1] == (2, {"title": "b"})
+    assert _errors(records)[3].startswith("Invalid JSON")
+    assert records[3] == (4, {"title": "c"})
+
+
+def test_multibyte_characters_split_across_chunks():
+    raw = '{"title": "café"}\n'.encode()
+    split = raw.index("é".encode()) + 1
+    assert _records([raw[:split], raw[split:]], "application/x-ndjson") == [(1, {"title": "café"})]
+
+
+def test_csv_maps_header_and_drops_empty_cells():
+    body = b"title, price ,category\nlamp,12.5,\nchair,30,furniture\n"
+    assert _records([body], "text/csv; charset=utf-8") == [
+        (1, {"title": "lamp", "price": "12.5"}),
+        (2, {"title": "chair", "price": "30", "category": "furniture"}),
+    ]
+
+
+def test_csv_quoted_field_spanning_lines_and_chunks():
+    body = b'title,description\n"desk","two\nlines, one comma"\nlamp,plain\n'
+    records = _records([body[:30], body[30:]], "text/csv")
+    assert records == [
+        (1, {"title": "desk", "description": "two\nlines, one comma"}),
+        (2, {"title": "lamp", "description": "plain"}),
+    ]
+
+
+def test_csv_reports_bad_rows_and_continues():
+    records = _records([b'title,price\nlamp\nchair,3\n"open,1\n'], "text/csv")
+    assert _errors(records) == {1: "Expected 2 columns, got 1", 3: "Unterminated quoted field"}
+    assert records[1] == (2, {"title": "chair", "price": "3"})
@@ -0,0 +1,36 @@
+from datetime import datetime
+import pytest
+from bson.objectid import ObjectId
+from app.services.carts import CartConflict, build_update, invalid_product_ids
+
+NOW = datetime(2024, 1, 1)
+
+
+def test_build_update_combines_operations():
+    added, updated, removed = (str(ObjectId()) for _ in range(3))
+    spec = build_update(add=[(added, 2)], update=[(updated, 5)], remove=[removed], now=NOW)
+    assert spec == {
+        "$inc": {"version": 1, f"items.{added}.quantity": 2},
+        "$set": {"updated_at": NOW, f"items.{updated}.quantity": 5},
+        "$min": {f"items.{added}.added_at": NOW, f"items.{updated}.added_at": NOW},
+        "$unset": {f"items.{removed}": ""},
+    }
+
+
+def test_build_update_with_no_lines_only_bumps_version():
+    assert build_update(now=NOW) == {"$inc": {"version": 1}, "$set": {"updated_at": NOW}}
+
+
+def test_same_product_twice_in_a_batch_conflicts():
+    pid = str(ObjectId())
+    with pytest.raises(CartConflict):
+        build_update(add=[(pid, 1)], remove=[pid], now=NOW)
+    with pytest.raises(CartConflict):
+        build_update(update=[(pid, 1), (pid, 2)], now=NOW)
+
+
+@pytest.mark.parametrize("product_id", ["a.b", "$where", "not-an-id"])
+def test_non_ids_never_become_field_paths(product_id):
+    assert invalid_product_ids([product_id, str(ObjectId())]) == [product_id]
+    with pytest.raises(ValueError):
+        build_update(add=[(product_id, 1)], now=NOW)
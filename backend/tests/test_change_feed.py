@@ -0,0 +1,71 @@
+# Needs a replica set (a single node is enough), since change streams do:
+#
+#   ECOFINDS_TEST_REPLICA_SET_URL="mongodb://localhost:27017/?replicaSet=rs0" python -m pytest tests/test_change_feed.py
+
+import asyncio
+import os
+import uuid
+import pytest
+from motor.motor_asyncio import AsyncIOMotorClient
+from app.core import change_feed
+
+REPLICA_SET_URL = os.environ.get("ECOFINDS_TEST_REPLICA_SET_URL")
+
+pytestmark = pytest.mark.skipif(not REPLICA_SET_URL, reason="ECOFINDS_TEST_REPLICA_SET_URL is not set")
+
+
+async def _next_event(events: asyncio.Queue, document_id=None, timeout: float = 5.0) -> change_feed.ChangeEvent:
+    """The next event, skipping any for other documents when `document_id` is given."""
+    async def wait():
+        while True:
+            event = await events.get()
+            if document_id is None or event.document_id == document_id:
+                return event
+    return await asyncio.wait_for(wait(), timeout)
+
+
+def test_stream_delivers_subscribed_fields(monkeypatch):
+    async def main():
+        client = AsyncIOMotorClient(REPLICA_SET_URL, serverSelectionTimeoutMS=5000)
+        db = client[f"ecofinds_test_{uuid.uuid4().hex[:8]}"]
+        monkeypatch.setattr(change_feed, "db", db)
+        monkeypatch.setattr(change_feed, "_subscribers", {})
+        monkeypatch.setattr(change_feed, "_document_fields", set())
+        events: asyncio.Queue = asyncio.Queue()
+        change_feed.subscribe("products", events.put_nowait, fields=["category"])
+        watcher = asyncio.create_task(change_feed._watch(["products"]))
+        try:
+            # The stream has no start signal; write until an event shows it is open
+            for _ in range(50):
+                await db.products.insert_one({"category": "books", "title": "lamp"})
+                try:
+                    event = await _next_event(events, timeout=0.2)
+                    break
+                except asyncio.TimeoutError:
+                    continue
+            else:
+                pytest.fail("Change stream delivered no insert")
+            product_id = event.document_id
+            assert event.operation == "insert"
+            assert event.document == {"category": "books"}
+
+            await db.products.update_one({"_id": product_id}, {"$set": {"title": "desk"}})
+            event = await _next_event(events, product_id)
+            assert event.operation == "update"
+            assert event.updated_fields == {"title"}
+            assert event.document == {"category": "books"}
+
+            await db.products.delete_one({"_id": product_id})
+            event = await _next_event(events, product_id)
+            assert (event.operation, event.document) == ("delete", None)
+
+            # Unsubscribed collections are filtered out on the server
+            other = await db.other.insert_one({})
+            with pytest.raises(asyncio.TimeoutError):
+                await _next_event(events, other.inserted_id, timeout=0.5)
+        finally:
+            watcher.cancel()
+            await asyncio.gather(watcher, return_exceptions=True)
+            await client.drop_database(db.name)
+            client.close()
+    asyncio.run(main())
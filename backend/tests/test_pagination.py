@@ -0,0 +1,67 @@
+import pytest
+from bson.objectid import ObjectId
+from fastapi import HTTPException
+from pymongo import ASCENDING, DESCENDING
+from app.core.pagination import apply_cursor, decode_cursor, encode_cursor, keyset_filter, with_tiebreaker
+
+PRICE_ASC = with_tiebreaker([("price", ASCENDING)])
+NEWEST = with_tiebreaker([("created_at", DESCENDING)])
+
+
+def test_with_tiebreaker_follows_last_direction():
+    assert PRICE_ASC == [("price", ASCENDING), ("_id", ASCENDING)]
+    assert NEWEST == [("created_at", DESCENDING), ("_id", DESCENDING)]
+    assert with_tiebreaker(NEWEST) == NEWEST
+
+
+def test_keyset_filter_single_field():
+    assert keyset_filter([("_id", DESCENDING)], [5]) == {"_id": {"$lt": 5}}
+
+
+def test_keyset_filter_expands_ties_and_bounds_leading_field():
+    oid = ObjectId()
+    assert keyset_filter(PRICE_ASC, [10.0, oid]) == {
+        "price": {"$gte": 10.0},
+        "$or": [
+            {"price": {"$gt": 10.0}},
+            {"price": 10.0, "_id": {"$gt": oid}},
+        ],
+    }
+
+
+def test_keyset_filter_descending_three_fields():
+    sort = [("a", DESCENDING), ("b", DESCENDING), ("_id", DESCENDING)]
+    assert keyset_filter(sort, [3, 2, 1]) == {
+        "a": {"$lte": 3},
+        "$or": [
+            {"a": {"$lt": 3}},
+            {"a": 3, "b": {"$lt": 2}},
+            {"a": 3, "b": 2, "_id": {"$lt": 1}},
+        ],
+    }
+
+
+def test_cursor_round_trip():
+    doc = {"_id": ObjectId(), "price": 12.5}
+    assert decode_cursor(encode_cursor(doc, PRICE_ASC), PRICE_ASC) == [12.5, doc["_id"]]
+
+
+def test_cursor_from_another_sort_is_rejected():
+    cursor = encode_cursor({"_id": ObjectId(), "price": 12.5}, PRICE_ASC)
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, with_tiebreaker([("price", DESCENDING)]))
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.parametrize("cursor", ["garbage", "", "W10"])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor, PRICE_ASC)
+    assert exc.value.status_code == 400
+
+
+def test_apply_cursor_combines_with_query():
+    doc = {"_id": ObjectId(), "price": 12.5}
+    query = apply_cursor({"category": "books"}, PRICE_ASC, encode_cursor(doc, PRICE_ASC))
+    assert query == {"$and": [{"category": "books"}, keyset_filter(PRICE_ASC, [12.5, doc["_id"]])]}
+    assert apply_cursor({"category": "books"}, PRICE_ASC, None) == {"category": "books"}
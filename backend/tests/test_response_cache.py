@@ -0,0 +1,109 @@
+import asyncio
+from app.core.cache import TTLCache
+from app.core.response_cache import ResponseCache, etag_matches
+
+
+class FakeTimer:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_ttl_cache_reports_size_and_expiry_evictions():
+    timer = FakeTimer()
+    evicted = []
+    cache = TTLCache(maxsize=2, ttl=10, timer=timer, on_evict=evicted.append)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now least recently used
+    cache.set("c", 3)
+    assert evicted == ["b"]
+    timer.now = 11
+    assert cache.get("a") is None
+    assert evicted == ["b", "a"]
+    # Explicit invalidation is the caller's own doing and isn't reported
+    cache.invalidate("c")
+    assert evicted == ["b", "a"]
+
+
+async def _load(cache: ResponseCache, key, tags, value="x"):
+    async def loader():
+        return {"value": value}, {}
+    return await cache.get_or_load(key, tags, loader)
+
+
+def test_evicted_entries_leave_no_tags_behind():
+    async def main():
+        cache = ResponseCache(maxsize=2, ttl=60)
+        await _load(cache, "a", ["product:1", "listing:all"])
+        await _load(cache, "b", ["product:2", "listing:all"])
+        await _load(cache, "c", ["product:3"])
+        assert cache.get("a") is None
+        assert set(cache._tags) == {"product:2", "product:3", "listing:all"}
+        assert cache._tags["listing:all"] == {"b"}
+        assert set(cache._key_tags) == {"b", "c"}
+    asyncio.run(main())
+
+
+def test_invalidate_tags_drops_tagged_entries_only():
+    async def main():
+        cache = ResponseCache(maxsize=10, ttl=60)
+        await _load(cache, "a", ["product:1", "listing:all"])
+        await _load(cache, "b", ["product:2"])
+        cache.invalidate_tags("listing:all")
+        assert cache.get("a") is None
+        assert cache.get("b") is not None
+        assert set(cache._tags) == {"product:2"}
+        assert set(cache._key_tags) == {"b"}
+        cache.invalidate_tag_prefix("product:")
+        assert cache.get("b") is None
+        assert not cache._tags and not cache._key_tags
+    asyncio.run(main())
+
+
+def test_load_overlapping_an_invalidation_is_stored_only_if_unaffected():
+    async def main():
+        cache = ResponseCache(maxsize=10, ttl=60)
+        release = asyncio.Event()
+
+        async def slow():
+            await release.wait()
+            return {}, {}
+
+        own = asyncio.create_task(cache.get_or_load("own", ["product:1"], slow))
+        other = asyncio.create_task(cache.get_or_load("other", ["product:2"], slow))
+        await asyncio.sleep(0)
+        cache.invalidate_tags("product:1")
+        release.set()
+        await asyncio.gather(own, other)
+        assert cache.get("own") is None
+        assert cache.get("other") is not None
+        assert not cache._invalidated
+    asyncio.run(main())
+
+
+def test_concurrent_misses_share_one_load():
+    async def main():
+        cache = ResponseCache(maxsize=10, ttl=60)
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0)
+            return {"n": calls}, {}
+
+        entries = await asyncio.gather(*(cache.get_or_load("k", [], loader) for _ in range(5)))
+        assert calls == 1
+        assert len({entry.etag for entry in entries}) == 1
+        assert cache.coalesced == 4
+    asyncio.run(main())
+
+
+def test_etag_matches_uses_weak_comparison():
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"def"', '"abc"')
+    assert not etag_matches(None, '"abc"')